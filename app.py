@@ -1,7 +1,20 @@
 import streamlit as st
 import pandas as pd
+import time
+import uuid
+from functools import partial
+from streamlit.errors import StreamlitAPIException
 from utils import clean_headers
-from data_processing import process_first_packet
+from data_processing import STAGE_MEMO, STREAM_TYPES, load_packets
+from workbook import open_workbook
+from export import EXPORT_FORMATS, available_formats, exported_bytes
+from grid import paginated_grid
+from instrumentation import recent_traces, steps_frame, traces_frame
+from reference_data import default_store
+from schema import arrow_compatible
+from jobs import CANCELLED, DONE, FAILED, QUEUED, RUNNING, default_runner
+from streaming import iter_sheet_chunks
+from validation import validate, validate_chunks
 
 # --- Streamlit App Config ---
 st.set_page_config(
@@ -19,6 +32,11 @@ uploaded_file = st.sidebar.file_uploader(
     help="Изберете Excel датотека со ИСИДОРА податоци"
 )
 
+streaming_mode = st.sidebar.checkbox(
+    "Режим за големи датотеки",
+    help="Листот 'Примени податоци' се чита во делови, со ограничена меморија"
+)
+
 selected_sheet = None
 sheet_names = []
 data_loaded = False
@@ -26,15 +44,18 @@ data_loaded = False
 df = None
 if uploaded_file:
     try:
-        xls = pd.ExcelFile(uploaded_file)
-        sheet_names = xls.sheet_names
+        # The workbook is parsed once per upload and shared by every stage below
+        workbook = open_workbook(uploaded_file)
+        sheet_names = workbook.sheet_names
         default_sheet = next((s for s in sheet_names if s.strip().lower() == "примени податоци".lower()), sheet_names[0])
         selected_sheet = st.sidebar.selectbox(
             "Изберете лист за анализа",
             sheet_names,
             index=sheet_names.index(default_sheet)
         )
-        df = pd.read_excel(uploaded_file, sheet_name=selected_sheet)
+        # In streaming mode the main sheet is never loaded whole
+        if not (streaming_mode and selected_sheet.strip().lower() == "примени податоци"):
+            df = workbook.sheet(selected_sheet)
         data_loaded = True
         st.sidebar.success(f"Успешно вчитани податоци од листот: {selected_sheet}")
     except Exception as e:
@@ -54,29 +75,160 @@ if not data_loaded:
 # --- If not 'Примени податоци ', show only table ---
 if selected_sheet.strip().lower() != "примени податоци":
     st.subheader(f"Табеларен приказ за листот: {selected_sheet}")
-    st.dataframe(df, use_container_width=True, height=500)
+    paginated_grid(df, key="sheet_grid", height=500, data_key=(workbook.digest, selected_sheet))
     st.info("За напредна анализа, изберете 'Примени податоци '")
     st.stop()
 
-# --- First Packet: Show by default ---
-with st.spinner("Обработка на податоци..."):
-    try:
-        processed_df = process_first_packet(uploaded_file)
-        if processed_df is not None and not processed_df.empty:
-            st.subheader("📋 First Packet")
-            st.dataframe(processed_df, use_container_width=True, height=600)
-            # Download button
-            csv = processed_df.to_csv(index=False).encode('utf-8-sig')
-            st.download_button(
-                label="⬇️ Преземи како CSV",
-                data=csv,
-                file_name="first_packet.csv",
-                mime="text/csv"
-            )
-    except Exception as e:
-        st.error(f"Error processing First Packet: {str(e)}")
+# --- Packets: processed as a background job ---
+# Jobs are keyed by file content, mode and the reference snapshots, so reruns and other
+# sessions uploading the same packet poll the running job instead of starting the work
+# again, while a session uploading it after a snapshot refresh gets the new mappings
+runner = default_runner()
+reference = default_store()
+packet_key = (workbook.digest, streaming_mode)
+# Jobs are shared by sessions; each session watches the job it polls
+session_id = st.session_state.setdefault("session_id", uuid.uuid4().hex)
+
+
+def submit_packets():
+    # The snapshot stamps are read once, before submitting, and stay in the job's key
+    job_key = packet_key + (reference.refreshed_at('company_names'), reference.refreshed_at('sectors'))
+    job = runner.submit(job_key, load_packets, workbook, streaming=streaming_mode,
+                        memo=STAGE_MEMO, label="process_packets", source=workbook, watcher=session_id)
+    st.session_state.packets_job = job.id
+    st.session_state.packets_job_left = None
+    return job
+
+
+def job_progress(job_id):
+    """Progress of a running job, polled until it is done; then the whole page is rerun."""
+    job = runner.get(job_id)
+    if job is None or job.done:
+        st.rerun()
+    text = f"Обработка на податоци... {job.message}" if job.status == RUNNING else "Во ред за обработка..."
+    st.progress(job.progress, text=text)
+    if st.button("✖️ Откажи", key="cancel_packets"):
+        # The job keeps running while other sessions still watch it; this session stops waiting
+        job.cancel(session_id)
+        st.session_state.packets_job_left = job.id
+        st.rerun()
+
+
+job = runner.get(st.session_state.get("packets_job"))
+# A snapshot refreshed while the job runs (e.g. started by its own cold lookups) does not re-key it
+if job is None or job.key[:len(packet_key)] != packet_key:
+    job = submit_packets()
+
+left_job = st.session_state.get("packets_job_left") == job.id
+
+if job.status == DONE and not left_job:
+    packets = job.result() or {}
+    if job.steps:
+        # What the job computed, and what it cost
+        with st.expander(f"Фази на обработка ({job.finished - job.started:.1f}s)"):
+            st.dataframe(steps_frame(job.steps), use_container_width=True, hide_index=True)
+            st.caption("Последни обработки во овој процес (записите се и во JSON дневникот):")
+            st.dataframe(traces_frame(recent_traces()), use_container_width=True, hide_index=True)
+    for packet_name, packet in packets.items():
+        processed_df = packet.rows
+        if processed_df is None or processed_df.empty:
+            continue
+        packet_key = packet_name.lower().replace(" ", "_")
+        st.subheader(f"📋 {packet_name}")
+        paginated_grid(processed_df, key=f"{packet_key}_grid", height=600, data_key=(job.id, packet_name))
+        if packet.summary is not None:
+            with st.expander(f"Збир: {packet_name}"):
+                st.dataframe(packet.summary, use_container_width=True, hide_index=True)
+        # Download button: the export runs only when the download is requested; Streamlit then
+        # holds the finished file in memory to serve it
+        export_format = st.selectbox(
+            "Формат за преземање",
+            available_formats(),
+            format_func=lambda name: EXPORT_FORMATS[name].label,
+            key=f"{packet_key}_format"
+        )
+        download = partial(exported_bytes, processed_df, export_format, sheet_name=packet_name)
+        download_args = dict(
+            label=f"⬇️ Преземи како {EXPORT_FORMATS[export_format].label}",
+            file_name=f"{packet_key}{EXPORT_FORMATS[export_format].suffix}",
+            mime=EXPORT_FORMATS[export_format].mime,
+            key=f"{packet_key}_download"
+        )
+        try:
+            st.download_button(data=download, **download_args)
+        except StreamlitAPIException:
+            # Streamlit versions without deferred downloads
+            st.download_button(data=download(), **download_args)
+elif job.done or left_job:
+    if job.status == CANCELLED or left_job:
+        st.warning("Обработката е откажана.")
+    else:
+        st.error(f"Error processing packets: {job.error}")
+    if st.button("🔄 Обработи повторно"):
+        submit_packets()
+        st.rerun()
+elif hasattr(st, "fragment"):
+    # Only the progress bar is rerun while the job works
+    st.fragment(run_every=1)(job_progress)(job.id)
+else:
+    # Streamlit versions without fragments poll by rerunning the page
+    job_progress(job.id)
+    time.sleep(1)
+    st.rerun()
+
+# --- Jobs of every session in this process ---
+with st.sidebar.expander("🧾 Обработки"):
+    status_labels = {QUEUED: "⏳ во ред", RUNNING: "🔄 во тек", DONE: "✅ готово",
+                     FAILED: "❌ грешка", CANCELLED: "✖️ откажано"}
+    st.dataframe(pd.DataFrame({
+        "Датотека": [j.source or "" for j in runner.jobs()],
+        "Статус": [status_labels[j.status] for j in runner.jobs()],
+        "Напредок": [f"{j.progress:.0%}" for j in runner.jobs()],
+    }), use_container_width=True, hide_index=True)
+
+# --- Validation before submission: ISIN check digits and cross-field rules ---
+if st.button("🔎 Валидација пред поднесување"):
+    st.session_state.show_validation = True
+if st.session_state.get("show_validation"):
+    st.subheader("🔎 Валидација")
+    # The report is kept per workbook, so reruns do not validate the same packet again
+    report = st.session_state.get("validation_report")
+    if report is None or st.session_state.get("validation_digest") != workbook.digest:
+        # In streaming mode the sheet is validated chunk by chunk, never loaded whole
+        if df is None:
+            report = validate_chunks(iter_sheet_chunks(workbook.stream(), selected_sheet, types=STREAM_TYPES))
+        else:
+            report = validate(df)
+        st.session_state.validation_report = report
+        st.session_state.validation_digest = workbook.digest
+    if report.ok:
+        st.success(f"Нема прекршувања ({report.rows_checked:,} редови, {report.seconds:.2f}s)")
+    else:
+        st.warning(f"{sum(v.count for v in report.violations):,} прекршувања во "
+                   f"{report.rows_checked:,} редови ({report.seconds:.2f}s)")
+        st.dataframe(report.summary(), use_container_width=True, hide_index=True)
+        chosen_check = st.selectbox("Прикажи ги редовите за правилото",
+                                    [v.check.name for v in report.violations])
+        if df is None:
+            # The sheet is streamed again once per rule shown, keeping only its violating rows
+            if st.session_state.get("validation_rows_for") != (workbook.digest, chosen_check):
+                # Mixed-type columns become text, as they are when the sheet is parsed whole
+                st.session_state.validation_rows = arrow_compatible(report.rows_from_chunks(
+                    iter_sheet_chunks(workbook.stream(), selected_sheet, types=STREAM_TYPES), chosen_check))
+                st.session_state.validation_rows_for = (workbook.digest, chosen_check)
+            violating = st.session_state.validation_rows
+        else:
+            violating = report.rows(df, chosen_check)
+        paginated_grid(violating, key="validation_grid", height=400)
+    if report.skipped:
+        st.caption(f"Прескокнати правила (недостасуваат колони): {', '.join(report.skipped)}")
 
 # --- Button to show all columns from the original Excel sheet ---
+# The table stays open across reruns, so its pager can be used
 if st.button("📋 Прикажи ги сите колони (оригинални податоци)"):
+    st.session_state.show_original = True
+if st.session_state.get("show_original"):
     st.subheader("📋 Оригинални податоци (сите колони)")
-    st.dataframe(df, use_container_width=True, height=600)
\ No newline at end of file
+    if df is None:
+        df = workbook.sheet(selected_sheet)
+    paginated_grid(df, key="original_grid", height=600, data_key=(workbook.digest, selected_sheet))
\ No newline at end of file
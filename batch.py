@@ -0,0 +1,124 @@
+"""
+Batch processing of ISIDORA workbooks.
+
+    python batch.py data/2025/ "archive/Paket HV *.xlsx" --output out/first_packet
+
+Every workbook is processed like process_first_packet in its own worker
+process, and the results are written to one Parquet dataset partitioned
+by Година and Пакет. Errors are reported per file and do not stop the run.
+"""
+import argparse
+import glob
+import hashlib
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import List, Tuple
+
+from data_processing import load_first_packet
+from reference_data import REFERENCE_COLUMNS, default_store
+from schema import arrow_compatible
+from streaming import DEFAULT_CHUNK_SIZE
+
+PARTITION_COLUMNS = ['Година', 'Пакет']
+
+
+def find_workbooks(patterns: List[str]) -> List[str]:
+    """Expand directories and glob patterns to .xlsx files, skipping Excel lock files."""
+    paths = []
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            pattern = os.path.join(pattern, '*.xlsx')
+        paths.extend(glob.glob(pattern))
+    return sorted({p for p in paths if not os.path.basename(p).startswith('~$')})
+
+
+def workbook_prefix(path: str) -> str:
+    """File name prefix of a workbook's Parquet files: its stem and a hash of its absolute path."""
+    stem = os.path.splitext(os.path.basename(path))[0]
+    path_hash = hashlib.sha1(os.path.abspath(path).encode('utf-8')).hexdigest()[:10]
+    return f'{stem}-{path_hash}'
+
+
+def remove_workbook_files(output: str, prefix: str) -> None:
+    """Delete a workbook's files from every partition, e.g. one its corrected file no longer has."""
+    for old in glob.glob(os.path.join(glob.escape(output), '**', f'{glob.escape(prefix)}-*.parquet'), recursive=True):
+        os.remove(old)
+
+
+def init_worker() -> None:
+    """Worker processes use the snapshot the parent refreshed and never start a refresh of their own."""
+    default_store().background_refresh = False
+
+
+def process_workbook(path: str, output: str, streaming: bool, chunk_size: int) -> Tuple[int, float]:
+    """Process one workbook and replace its files in the dataset; returns (rows, seconds)."""
+    started = time.perf_counter()
+    df = load_first_packet(path, streaming=streaming, chunk_size=chunk_size)
+    # Workbooks with the same name in different directories do not overwrite each other's files
+    prefix = workbook_prefix(path)
+    remove_workbook_files(output, prefix)
+    if df.empty:  # no PHoV/AHoV rows
+        return 0, time.perf_counter() - started
+    df['Извор'] = os.path.basename(path)
+    for col in PARTITION_COLUMNS:
+        df[col] = df[col].astype(str)
+    # One file per workbook and partition
+    arrow_compatible(df).to_parquet(
+        output, partition_cols=PARTITION_COLUMNS, index=False,
+        basename_template=f'{prefix}-{{i}}.parquet'
+    )
+    return len(df), time.perf_counter() - started
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Process directories of ISIDORA workbooks in parallel.")
+    parser.add_argument('paths', nargs='+', help="Directories or glob patterns of .xlsx workbooks")
+    parser.add_argument('--output', required=True, help="Directory of the partitioned Parquet dataset")
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help="Worker processes")
+    parser.add_argument('--streaming', action='store_true', help="Read the main sheet in bounded-memory chunks")
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE, help="Rows per chunk with --streaming")
+    args = parser.parse_args(argv)
+
+    workbooks = find_workbooks(args.paths)
+    if not workbooks:
+        print("No workbooks found.", file=sys.stderr)
+        return 1
+
+    # Take (or renew) the reference snapshot once here, so the workers do not each scan SQL Server
+    try:
+        store = default_store()
+        for name in REFERENCE_COLUMNS:
+            if store.is_stale(name):
+                store.refresh(name)
+    except Exception as e:
+        print(f"Reference data unavailable, workers will look keys up: {e}", file=sys.stderr)
+
+    errors = {}
+    total_rows = 0
+    started = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=args.workers, initializer=init_worker) as pool:
+        futures = {
+            pool.submit(process_workbook, path, args.output, args.streaming, args.chunk_size): path
+            for path in workbooks
+        }
+        for done, future in enumerate(as_completed(futures), 1):
+            path = futures[future]
+            try:
+                rows, seconds = future.result()
+                total_rows += rows
+                print(f"[{done}/{len(workbooks)}] {path}: {rows:,} rows in {seconds:.1f}s")
+            except Exception as e:
+                errors[path] = e
+                print(f"[{done}/{len(workbooks)}] {path}: ERROR {e}", file=sys.stderr)
+
+    print(f"Processed {len(workbooks) - len(errors)}/{len(workbooks)} workbooks, "
+          f"{total_rows:,} rows in {time.perf_counter() - started:.1f}s -> {args.output}")
+    for path, error in errors.items():
+        print(f"  failed: {path}: {error}", file=sys.stderr)
+    return 1 if errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
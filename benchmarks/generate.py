@@ -0,0 +1,223 @@
+"""
+Synthetic ISIDORA workbooks for benchmarks.
+
+    python benchmarks/generate.py 10000 100000 1000000 --output bench_data/
+
+For every row count this writes <rows>.xlsx, with 'Примени податоци' and
+'листа известувачи' sheets, and <rows>.sqlite with the vwDanocni_num and
+TblSektor tables the mappings are read from (see reference_data.SqliteBackend).
+Values are drawn with fixed seeds from pools sized like real packets, so
+the same row count always produces the same workbook.
+"""
+import argparse
+import os
+import sqlite3
+import sys
+from contextlib import closing
+from pathlib import Path
+from typing import Dict, List
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from export import write_workbook  # noqa: E402
+
+# Data rows that fit on one Excel sheet; larger frames can only be generated in memory
+EXCEL_MAX_ROWS = 1_048_575
+
+# Pool sizes, roughly those of a monthly packet
+SECURITIES = 4_000
+LISTED_SHARES = 120
+COUNTERPARTIES = 20_000
+# Share of non-resident counterparties, identified by LEI instead of матичен број
+NON_RESIDENT_SHARE = 0.15
+# Share of rows whose reporter name is typed differently from the reporter list
+NAME_VARIANT_SHARE = 0.05
+
+REPORTERS = [
+    'Комерцијална банка АД Скопје', 'Стопанска банка АД Скопје', 'НЛБ банка АД Скопје',
+    'Халкбанк АД Скопје', 'Шпаркасе банка АД Скопје', 'ПроКредит банка АД Скопје',
+    'Универзална инвестициона банка АД Скопје', 'ТТК банка АД Скопје', 'Силк Роуд банка АД Скопје',
+    'Централна кооперативна банка АД Скопје', 'Стопанска банка АД Битола', 'Капитал банка АД Скопје',
+    'Развојна банка на Северна Македонија АД Скопје', 'Еуростандард банка АД Скопје',
+    'НЛБ Пензиски фонд АД Скопје', 'КБ Прво пензиско друштво АД Скопје', 'Триглав пензиско друштво АД Скопје',
+    'Кроациа осигурување АД Скопје', 'Триглав осигурување АД Скопје', 'Еуролинк осигурување АД Скопје',
+    'Сава осигурување АД Скопје', 'Винер осигурување АД Скопје', 'Уника осигурување АД Скопје',
+    'Инвест Банка Брокер АД Скопје', 'Илирика Инвестментс АД Скопје', 'Текновест АД Скопје',
+    'Иннова Капитал ДУИФ Скопје', 'КБ Публикум Инвест ДУИФ Скопје', 'Генерали Инвестментс ДУИФ Скопје',
+    'ВФП Фондови ДУИФ Скопје',
+]
+
+# Value -> relative frequency
+AMOUNT_TYPES = {'DRVR': 0.30, 'DSK': 0.12, 'PRM': 0.12, 'POBJ': 0.14, 'KAM': 0.14,
+                'KUP': 0.08, 'PROD': 0.06, 'DIV': 0.04}
+PACKETS = {'PHoV': 0.40, 'AHoV': 0.15, 'KRD': 0.20, 'DEP': 0.15, 'DRG': 0.10}
+POSITIONS = {'A1': 0.35, 'A2': 0.20, 'A3': 0.10, 'L1': 0.20, 'L2': 0.15}
+INSTRUMENTS = {'F511': 0.25, 'F512': 0.10, 'F519': 0.05, 'F521': 0.10, 'F31': 0.35, 'F32': 0.15}
+CURRENCIES = {'MKD': 0.55, 'EUR': 0.35, 'USD': 0.08, 'CHF': 0.02}
+SECTORS = ['S11', 'S121', 'S122', 'S123', 'S124', 'S125', 'S126', 'S127',
+           'S128', 'S129', 'S13', 'S14', 'S15', 'S2']
+# Issuer country -> ISIN prefix
+ISSUER_COUNTRIES = {'MK': 0.60, 'DE': 0.08, 'US': 0.08, 'AT': 0.05, 'SI': 0.05,
+                    'HR': 0.04, 'FR': 0.04, 'LU': 0.03, 'XS': 0.03}
+COUNTERPARTY_COUNTRIES = ['DE', 'AT', 'SI', 'HR', 'RS', 'GB', 'US', 'LU', 'NL', 'CH']
+
+
+def _choice(rng: np.random.Generator, weights: Dict[str, float], size: int) -> np.ndarray:
+    values = np.array(list(weights), dtype=object)
+    p = np.array(list(weights.values()), dtype=float)
+    return rng.choice(values, size=size, p=p / p.sum())
+
+
+def isin_check_digit(body: str) -> str:
+    """Check digit of an 11-character ISIN body (letters as numbers, then Luhn)."""
+    digits = ''.join(str(int(char, 36)) for char in body)
+    total = 0
+    for position, digit in enumerate(reversed(digits)):
+        value = int(digit) * (2 if position % 2 == 0 else 1)
+        total += value - 9 if value > 9 else value
+    return str((10 - total % 10) % 10)
+
+
+def _isins(rng: np.random.Generator, prefixes: np.ndarray) -> List[str]:
+    alphabet = np.array(list('0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ'))
+    bodies = [prefix + ''.join(rng.choice(alphabet, 9)) for prefix in prefixes]
+    return [body + isin_check_digit(body) for body in bodies]
+
+
+def _leis(rng: np.random.Generator, count: int) -> np.ndarray:
+    alphabet = np.array(list('0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ'))
+    return np.array([''.join(rng.choice(alphabet, 20)) for _ in range(count)], dtype=object)
+
+
+def reporter_list(seed: int = 0) -> pd.DataFrame:
+    """The 'листа известувачи' sheet: every reporter with its матичен број."""
+    rng = np.random.default_rng(seed)
+    numbers = rng.choice(np.arange(4_000_000, 7_999_999), len(REPORTERS), replace=False)
+    return pd.DataFrame({
+        'Реден број': np.arange(1, len(REPORTERS) + 1),
+        'Опис МК': REPORTERS,
+        'матичен број': numbers,
+    })
+
+
+def counterparties(seed: int = 0) -> pd.DataFrame:
+    """Resident counterparties: матичен број, name (vwDanocni_num) and sector (TblSektor)."""
+    rng = np.random.default_rng(seed + 1)
+    numbers = rng.choice(np.arange(4_000_000, 7_999_999), COUNTERPARTIES, replace=False)
+    return pd.DataFrame({
+        'Matbr': numbers,
+        'Poln_naziv_DO': [f'Друштво {n} ДООЕЛ Скопје' for n in numbers],
+        'Sektor': rng.choice(SECTORS[:-1], COUNTERPARTIES),
+    })
+
+
+def received_data(rows: int, reporters: pd.DataFrame, parties: pd.DataFrame,
+                  seed: int = 0, periods: int = 1, end: str = '2025-01-31') -> pd.DataFrame:
+    """The 'Примени податоци' sheet: ``rows`` rows over ``periods`` month ends up to ``end``."""
+    rng = np.random.default_rng(seed + 2)
+
+    # Securities: ISIN, issuer country and, for shares listed on the MSE, a ticker
+    countries = _choice(rng, ISSUER_COUNTRIES, SECURITIES)
+    isins = np.array(_isins(rng, countries), dtype=object)
+    tickers = np.full(SECURITIES, None, dtype=object)
+    listed = np.flatnonzero(countries == 'MK')[:LISTED_SHARES]
+    tickers[listed] = [f'{chr(65 + i // 26 % 26)}{chr(65 + i % 26)}{"KMT"[i % 3]}' for i in range(len(listed))]
+    security = rng.zipf(1.3, rows) % SECURITIES  # a few securities are held by almost everyone
+    by_ticker = (tickers[security] != None) & (rng.random(rows) < 0.5)  # noqa: E711
+
+    # Reporters, with a share of rows typed in lower case or with trailing spaces
+    reporter = rng.choice(reporters['Опис МК'].to_numpy(dtype=object), rows)
+    variant = rng.random(rows) < NAME_VARIANT_SHARE
+    reporter[variant] = [name.lower() + ' ' for name in reporter[variant]]
+
+    # Counterparties: residents by матичен број, non-residents by LEI
+    non_resident = rng.random(rows) < NON_RESIDENT_SHARE
+    codes = rng.choice(parties['Matbr'].to_numpy(), rows).astype(object)
+    codes[non_resident] = rng.choice(_leis(rng, 2_000), int(non_resident.sum()))
+    party_kind = rng.choice(np.array(['L', 'I', 'S'], dtype=object), rows, p=[0.6, 0.3, 0.1])
+    party_type = np.where(non_resident, 'N', 'R').astype(object) + party_kind
+    country = np.where(non_resident, rng.choice(COUNTERPARTY_COUNTRIES, rows), 'MK').astype(object)
+    sector = np.where(non_resident, 'S2', rng.choice(SECTORS[:-1], rows)).astype(object)
+
+    dates = pd.date_range(end=end, periods=periods, freq='ME')
+    amounts = rng.lognormal(12, 2.5, rows).round(2)
+    amounts[rng.random(rows) < 0.03] *= -1  # corrections
+
+    return pd.DataFrame({
+        'Известувач': reporter,
+        'Извештаен датум': rng.choice(dates, rows),
+        'Пакет': _choice(rng, PACKETS, rows),
+        'Позиција': _choice(rng, POSITIONS, rows),
+        'Вид на износ': _choice(rng, AMOUNT_TYPES, rows),
+        'Износ во денари': amounts,
+        'Валута': _choice(rng, CURRENCIES, rows),
+        'Идентификатор на хартија од вредност': np.where(by_ticker, 'OTID', 'ISIN').astype(object),
+        'Алфанумеричка ознака на хартија од вредност': np.where(by_ticker, tickers[security], isins[security]),
+        'Котација': np.where(tickers[security] != None, 'KT', 'NK').astype(object),  # noqa: E711
+        'Вид на х.в. (ЕСА2010)': _choice(rng, INSTRUMENTS, rows),
+        'Тип на договорна страна': party_type,
+        'Идентификациски код на договорна страна': codes,
+        'Земја': country,
+        'Сектор': sector,
+    })
+
+
+def generate_packet(rows: int, seed: int = 0, periods: int = 1) -> Dict[str, pd.DataFrame]:
+    """Sheets of a synthetic workbook, plus the reference tables under 'vwDanocni_num' and 'TblSektor'."""
+    reporters = reporter_list(seed)
+    parties = counterparties(seed)
+    # Reporters are companies too, so their names are in vwDanocni_num
+    names = pd.concat([
+        parties[['Matbr', 'Poln_naziv_DO']],
+        reporters.rename(columns={'матичен број': 'Matbr', 'Опис МК': 'Poln_naziv_DO'})[['Matbr', 'Poln_naziv_DO']],
+    ], ignore_index=True)
+    return {
+        'Примени податоци': received_data(rows, reporters, parties, seed, periods),
+        'листа известувачи': reporters,
+        'vwDanocni_num': names.rename(columns={'Matbr': 'Matbr_stat'}),
+        'TblSektor': parties[['Matbr', 'Sektor']],
+    }
+
+
+def write_reference_sqlite(packet: Dict[str, pd.DataFrame], path: str) -> None:
+    """Write the reference tables of a packet to a SQLite file for reference_data.SqliteBackend."""
+    if os.path.exists(path):
+        os.remove(path)
+    with closing(sqlite3.connect(path)) as conn:
+        for table in ('vwDanocni_num', 'TblSektor'):
+            packet[table].to_sql(table, conn, index=False)
+
+
+def write_packet(rows: int, output: str, seed: int = 0, periods: int = 1) -> Dict[str, str]:
+    """Generate and write <rows>.xlsx and <rows>.sqlite to ``output``; returns their paths."""
+    if rows > EXCEL_MAX_ROWS:
+        raise ValueError(f"{rows} rows do not fit on one Excel sheet (at most {EXCEL_MAX_ROWS})")
+    os.makedirs(output, exist_ok=True)
+    packet = generate_packet(rows, seed, periods)
+    paths = {'workbook': os.path.join(output, f'{rows}.xlsx'),
+             'reference': os.path.join(output, f'{rows}.sqlite')}
+    write_workbook({name: packet[name] for name in ('Примени податоци', 'листа известувачи')},
+                   paths['workbook'])
+    write_reference_sqlite(packet, paths['reference'])
+    return paths
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Generate synthetic ISIDORA workbooks.")
+    parser.add_argument('rows', nargs='+', type=int, help="Row counts of 'Примени податоци'")
+    parser.add_argument('--output', default='bench_data', help="Directory for the .xlsx and .sqlite files")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--periods', type=int, default=1, help="Month ends the rows are spread over")
+    args = parser.parse_args(argv)
+
+    for rows in args.rows:
+        paths = write_packet(rows, args.output, args.seed, args.periods)
+        print(f"{rows:>10,} rows: {paths['workbook']}, {paths['reference']}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,223 @@
+"""
+Benchmarks of the ISIDORA processing functions on synthetic workbooks.
+
+    python benchmarks/run_benchmarks.py --rows 10000 100000
+    python benchmarks/run_benchmarks.py --rows 100000 --compare benchmarks/results/3f2a9c1.json
+
+Workbooks come from benchmarks/generate.py and are kept in --data between
+runs; the SQL mappings are read from its SQLite stand-in. Every function is
+timed over --repeat runs (the median is reported) and run once more under
+tracemalloc for its peak allocation. Results are written to
+benchmarks/results/<commit>.json, so two commits can be compared with
+--compare, which exits non-zero when anything got slower or bigger than
+--threshold allows.
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+ROOT = Path(__file__).resolve().parent.parent
+RESULTS_DIR = Path(__file__).resolve().parent / 'results'
+
+# Keep the benchmark's reference snapshot and sheet cache away from the user's
+os.environ['ISIDORA_CACHE_DIR'] = tempfile.mkdtemp(prefix='isidora-bench-')
+sys.path.append(str(ROOT))
+
+import pandas as pd  # noqa: E402
+
+import data_processing  # noqa: E402
+import reference_data  # noqa: E402
+from generate import EXCEL_MAX_ROWS, REPORTERS, generate_packet, write_packet  # noqa: E402
+from pipeline import StageMemo  # noqa: E402
+from reference_data import ReferenceStore, SqliteBackend  # noqa: E402
+from schema import apply_schema  # noqa: E402
+from utils import clean_headers, export_to_excel, filter_data, prepare_sostojba_na_hv, summarize_data  # noqa: E402
+from workbook import WorkbookSession  # noqa: E402
+
+DEFAULT_ROWS = [10_000, 100_000]
+# Benchmarks whose state is filled by one untimed run first
+PRIMED = {'process_first_packet (memoized rerun)'}
+
+
+def measure(func: Callable[[], object], repeat: int, prime: bool = False) -> Dict:
+    """Median and individual wall times of ``func`` over ``repeat`` runs, and its peak traced allocation."""
+    if prime:
+        func()
+    times = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - started)
+    # Measured separately: tracing allocations slows the timed runs down
+    tracemalloc.start()
+    try:
+        func()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return {'seconds': statistics.median(times), 'runs': times, 'peak_mb': peak / 1024 / 1024}
+
+
+def fresh_reference_store() -> ReferenceStore:
+    """A reference store over the generated tables with an empty snapshot file of its own."""
+    path = Path(tempfile.mkdtemp(dir=os.environ['ISIDORA_CACHE_DIR'])) / 'reference.sqlite'
+    # No background refresh, so a run's full snapshot is not still being taken during the next one
+    return ReferenceStore(SqliteBackend(os.environ['ISIDORA_REFERENCE_SQLITE']), path=path,
+                          background_refresh=False)
+
+
+def first_packet_benchmarks(workbook_path: str) -> Dict[str, Callable[[], object]]:
+    """process_first_packet on the generated workbook: cold, streaming and as a memoized rerun."""
+    with open(workbook_path, 'rb') as handle:
+        data = handle.read()
+
+    def run(session, streaming=False):
+        df = data_processing.process_first_packet(session, streaming=streaming)
+        if df.empty:
+            raise RuntimeError("process_first_packet returned no rows")
+        return df
+
+    def cold(streaming=False):
+        # A new session, memo and reference store: the workbook is parsed, every stage
+        # computed and the reference keys looked up, as on a first upload
+        data_processing.STAGE_MEMO = StageMemo()
+        shared, reference_data._default_store = reference_data._default_store, fresh_reference_store()
+        try:
+            return run(WorkbookSession(data, cache=None), streaming)
+        finally:
+            reference_data._default_store = shared
+
+    warm = WorkbookSession(data, cache=None)
+
+    def rerun():
+        return run(warm)
+
+    return {
+        'process_first_packet': cold,
+        'process_first_packet (streaming)': lambda: cold(streaming=True),
+        'process_first_packet (memoized rerun)': rerun,
+    }
+
+
+def frame_benchmarks(df: pd.DataFrame, rows: int, output: str) -> Dict[str, Callable[[], object]]:
+    """The IsidoraReport functions, on the main sheet typed by its schema."""
+    dates = sorted(df['Извештаен датум'].dropna().unique())
+    date_range = (str(pd.Timestamp(dates[0]).date()), str(pd.Timestamp(dates[-1]).date()))
+    export_path = os.path.join(output, f'export-{rows}.xlsx')
+    benchmarks = {
+        'clean_headers': lambda: clean_headers(df.copy(deep=False)),
+        'prepare_sostojba_na_hv': lambda: prepare_sostojba_na_hv(df),
+        'filter_data': lambda: filter_data(df, date_range=date_range, reporter=REPORTERS[0]),
+        'summarize_data': lambda: summarize_data(df),
+    }
+    if rows <= EXCEL_MAX_ROWS:
+        benchmarks['export_to_excel'] = lambda: export_to_excel(df, export_path)
+    return benchmarks
+
+
+def run_suite(sizes: List[int], data_dir: str, repeat: int, only: Optional[List[str]] = None) -> Dict[str, Dict]:
+    """Run every benchmark at every size; results keyed by '<function>@<rows>'."""
+    results = {}
+    for rows in sizes:
+        packet = generate_packet(rows)
+        df = apply_schema(packet['Примени податоци'], 'Примени податоци')
+        benchmarks = frame_benchmarks(df, rows, data_dir)
+        if rows <= EXCEL_MAX_ROWS:
+            paths = {'workbook': os.path.join(data_dir, f'{rows}.xlsx'),
+                     'reference': os.path.join(data_dir, f'{rows}.sqlite')}
+            if not all(os.path.exists(path) for path in paths.values()):
+                print(f"Generating {rows:,} rows...", file=sys.stderr)
+                paths = write_packet(rows, data_dir)
+            # The reference tables do not depend on the row count, so one store serves every size
+            os.environ.setdefault('ISIDORA_REFERENCE_SQLITE', paths['reference'])
+            benchmarks.update(first_packet_benchmarks(paths['workbook']))
+        else:
+            print(f"{rows:,} rows do not fit on an Excel sheet; "
+                  "process_first_packet and export_to_excel are skipped", file=sys.stderr)
+
+        for name, func in benchmarks.items():
+            if only and not any(term in name for term in only):
+                continue
+            result = measure(func, repeat, prime=name in PRIMED)
+            results[f'{name}@{rows}'] = {'function': name, 'rows': rows, **result}
+            print(f"{name:<40} {rows:>10,} {result['seconds']:>10.3f}s {result['peak_mb']:>10.1f} MB")
+    return results
+
+
+def current_commit() -> str:
+    """Short hash of HEAD, suffixed '-dirty' when the tree has uncommitted changes."""
+    def git(*args):
+        return subprocess.run(['git', *args], cwd=ROOT, capture_output=True, text=True).stdout.strip()
+    commit = git('rev-parse', '--short', 'HEAD') or 'unknown'
+    return f'{commit}-dirty' if git('status', '--porcelain', '--untracked-files=no') else commit
+
+
+def save_results(results: Dict[str, Dict], path: Optional[str] = None) -> str:
+    """Write results with the commit and environment they were measured on; returns the path."""
+    commit = current_commit()
+    if path is None:
+        RESULTS_DIR.mkdir(exist_ok=True)
+        path = str(RESULTS_DIR / f'{commit}.json')
+    report = {
+        'commit': commit,
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'machine': platform.platform(),
+        'results': results,
+    }
+    with open(path, 'w', encoding='utf-8') as handle:
+        json.dump(report, handle, ensure_ascii=False, indent=2)
+    return path
+
+
+def compare(baseline_path: str, results: Dict[str, Dict], threshold: float) -> List[str]:
+    """Print time and memory ratios against an earlier result; returns the benchmarks that regressed."""
+    with open(baseline_path, encoding='utf-8') as handle:
+        baseline = json.load(handle)
+    print(f"\nCompared with {baseline['commit']} ({baseline['created']}):")
+    regressions = []
+    for key, result in results.items():
+        before = baseline['results'].get(key)
+        if before is None:
+            continue
+        time_ratio = result['seconds'] / before['seconds'] if before['seconds'] else float('inf')
+        memory_ratio = result['peak_mb'] / before['peak_mb'] if before['peak_mb'] else float('inf')
+        regressed = time_ratio > 1 + threshold or memory_ratio > 1 + threshold
+        if regressed:
+            regressions.append(key)
+        print(f"{key:<50} time x{time_ratio:>6.2f}  memory x{memory_ratio:>6.2f}{'  REGRESSION' if regressed else ''}")
+    return regressions
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark ISIDORA processing on synthetic workbooks.")
+    parser.add_argument('--rows', nargs='+', type=int, default=DEFAULT_ROWS, help="Row counts to benchmark")
+    parser.add_argument('--repeat', type=int, default=3, help="Timed runs per benchmark")
+    parser.add_argument('--data', default=str(ROOT / 'bench_data'), help="Directory of generated workbooks")
+    parser.add_argument('--only', nargs='+', help="Run only benchmarks whose name contains one of these")
+    parser.add_argument('--output', help="Results file (default: benchmarks/results/<commit>.json)")
+    parser.add_argument('--compare', help="Earlier results file to compare with")
+    parser.add_argument('--threshold', type=float, default=0.2, help="Allowed slowdown or growth, e.g. 0.2 for 20%%")
+    args = parser.parse_args(argv)
+
+    os.makedirs(args.data, exist_ok=True)
+    results = run_suite(args.rows, args.data, args.repeat, args.only)
+    print(f"Results written to {save_results(results, args.output)}")
+    if args.compare:
+        return 1 if compare(args.compare, results, args.threshold) else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,7 +1,23 @@
+import sys
+from pathlib import Path
 import streamlit as st
 import pandas as pd
 import numpy as np
-from utils import IsidoraReport, clean_headers, summarize_data, prepare_sostojba_na_hv
+import plotly.express as px
+
+# Заедничките модули (workbook, ...) се наоѓаат во коренот на проектот
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from utils import IsidoraReport, clean_headers, prepare_sostojba_na_hv
+from workbook import open_workbook
+from normalize import normalize_categoricals
+from stock_flow import COMPONENTS, FLOWS, OPENING, STOCK_AMOUNT_TYPES, compute_stock_flow, component_of_amount_type
+from positions import default_position_store, period_of
+from fingerprint import FINGERPRINT_KEY, default_fingerprint_store, duplicate_mask, row_fingerprints
+from cube import MetricsCube
+from export import EXPORT_FORMATS, available_formats
+from grid import paginated_grid
+from instrumentation import recent_traces, step, steps_frame, trace, traces_frame
 from datetime import datetime, timedelta
 
 # Конфигурација на страницата
@@ -25,8 +41,16 @@ if 'isidora_report' not in st.session_state:
 # --- Caching for performance ---
 @st.cache_data
 def load_and_clean_data(uploaded_file, selected_sheet):
-    df = pd.read_excel(uploaded_file, sheet_name=selected_sheet)
-    return clean_headers(df)
+    with trace('load_data', source=uploaded_file, sheet=selected_sheet):
+        df = open_workbook(uploaded_file).sheet(selected_sheet)
+        with step('clean_headers', rows_in=len(df)):
+            df = clean_headers(df)
+        with step('normalize', rows_in=len(df)):
+            return normalize_categoricals(df)
+
+@st.cache_data
+def load_cube(uploaded_file, selected_sheet):
+    return MetricsCube(load_and_clean_data(uploaded_file, selected_sheet))
 
 @st.cache_data
 def prepare_sostojba_na_hv_cached(df):
@@ -45,9 +69,8 @@ with st.sidebar:
 
     if uploaded_file:
         try:
-            # Вчитување на листови
-            xls = pd.ExcelFile(uploaded_file)
-            sheet_names = xls.sheet_names
+            # Вчитување на листови (работната книга се парсира само еднаш)
+            sheet_names = open_workbook(uploaded_file).sheet_names
             
             # Избор на лист
             selected_sheet = st.selectbox(
@@ -56,21 +79,24 @@ with st.sidebar:
                 help="Изберете кој лист од Excel датотеката сакате да го анализирате"
             )
             
-            # Вчитување на податоци (cached)
-            st.session_state.isidora_report.data = load_and_clean_data(uploaded_file, selected_sheet)
+            # Вчитување на податоци (cached); индексот на извештајот се гради повторно
+            # само кога ќе се смени датотеката или листот, а не при секое повторно извршување
+            loaded_sheet = (open_workbook(uploaded_file).digest, selected_sheet)
+            if st.session_state.get("loaded_sheet") != loaded_sheet:
+                st.session_state.isidora_report.data = load_and_clean_data(uploaded_file, selected_sheet)
+                st.session_state.loaded_sheet = loaded_sheet
+            st.session_state.cube = cube = load_cube(uploaded_file, selected_sheet)
             st.success(f"Успешно вчитани податоци од листот {selected_sheet}")
             
             # Филтри
             st.subheader("🔍 Филтри")
             
             # Датумски филтер
-            date_cols = [col for col in st.session_state.isidora_report.data.columns 
-                        if 'датум' in str(col).lower()]
-            if date_cols:
+            if cube.date:
                 try:
-                    date_col = date_cols[0]
-                    min_date = pd.to_datetime(st.session_state.isidora_report.data[date_col].min())
-                    max_date = pd.to_datetime(st.session_state.isidora_report.data[date_col].max())
+                    dates = pd.to_datetime(cube.cells[cube.date], errors='coerce')
+                    min_date = dates.min()
+                    max_date = dates.max()
                     
                     date_range = st.date_input(
                         "Период на известување",
@@ -83,40 +109,45 @@ with st.sidebar:
                     date_range = None
             
             # Филтер за известувач
-            reporter_col = next((col for col in st.session_state.isidora_report.data.columns 
-                               if 'известувач' in str(col).lower()), None)
+            reporter_col = cube.reporter
             if reporter_col:
-                reporter_names = sorted(st.session_state.isidora_report.data[reporter_col].dropna().unique())
+                reporter_names = cube.members(reporter_col)
                 selected_reporter = st.selectbox(
                     "Известувач",
                     ["Сите"] + reporter_names
                 )
             
             # Филтер за тип на инструмент
-            instrument_col = next((col for col in st.session_state.isidora_report.data.columns 
-                                 if 'вид' in str(col).lower() and 'х.в.' in str(col).lower()), None)
+            instrument_col = cube.instrument
             if instrument_col:
-                instrument_types = sorted(st.session_state.isidora_report.data[instrument_col].dropna().unique())
+                instrument_types = cube.members(instrument_col)
                 selected_instrument = st.selectbox(
                     "Тип на инструмент",
                     ["Сите"] + instrument_types
                 )
             
             # Копче за извоз
-            if st.button("📥 Извези во Excel"):
+            export_format = st.selectbox(
+                "Формат за извоз",
+                available_formats(),
+                index=available_formats().index('xlsx'),
+                format_func=lambda name: EXPORT_FORMATS[name].label
+            )
+            if st.button(f"📥 Извези во {EXPORT_FORMATS[export_format].label}"):
                 try:
-                    filtered_data = st.session_state.isidora_report.data.copy()
-                    if 'date_range' in locals() and date_range and len(date_range) == 2:
-                        filtered_data = st.session_state.isidora_report.filter_by_date(
-                            pd.Timestamp(date_range[0]),
-                            pd.Timestamp(date_range[1])
-                        )
-                    if 'selected_reporter' in locals() and selected_reporter != "Сите":
-                        filtered_data = st.session_state.isidora_report.filter_by_reporter(selected_reporter)
+                    filtered_data = st.session_state.isidora_report.filter(
+                        date_range=(pd.Timestamp(date_range[0]), pd.Timestamp(date_range[1]))
+                        if 'date_range' in locals() and date_range and len(date_range) == 2 else None,
+                        reporter=selected_reporter
+                        if 'selected_reporter' in locals() and selected_reporter != "Сите" else None,
+                        instrument_type=selected_instrument
+                        if 'selected_instrument' in locals() and selected_instrument != "Сите" else None,
+                        exact_reporter=True
+                    )
                     
                     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-                    export_filename = f"isidora_извештај_{timestamp}.xlsx"
-                    st.session_state.isidora_report.export_report(export_filename)
+                    export_filename = f"isidora_извештај_{timestamp}{EXPORT_FORMATS[export_format].suffix}"
+                    st.session_state.isidora_report.export_report(export_filename, export_format, data=filtered_data)
                     st.success(f"Извештајот е зачуван како {export_filename}")
                 except Exception as e:
                     st.error(f"Грешка при извоз на податоците: {str(e)}")
@@ -127,36 +158,54 @@ with st.sidebar:
 # Главен панел за визуелизација
 if hasattr(st.session_state, 'isidora_report') and st.session_state.isidora_report.data is not None:
     try:
-        # Применување на филтри
-        filtered_data = st.session_state.isidora_report.data.copy()
+        # Применување на филтри врз коцката, без скенирање на редовите
+        active_dates = date_range if 'date_range' in locals() and date_range and len(date_range) == 2 else None
+        active_reporter = locals().get('selected_reporter')
+        active_instrument = locals().get('selected_instrument')
+        active_reporter = None if active_reporter == "Сите" else active_reporter
+        active_instrument = None if active_instrument == "Сите" else active_instrument
+
+        # Редовите се избираат преку индексот на извештајот (позиции, без копирање);
+        # известувачот од листата се бара целосно, исто како во коцката
+        filtered_data = st.session_state.isidora_report.filter(
+            date_range=active_dates,
+            reporter=active_reporter,
+            instrument_type=active_instrument,
+            exact_reporter=True
+        )
+        cube = st.session_state.get('cube')
+        if cube is None:
+            cube = MetricsCube(st.session_state.isidora_report.data)
+        selections = {cube.reporter: active_reporter, cube.instrument: active_instrument}
+        cube_cells = cube.slice(
+            date_range=active_dates,
+            **{dimension: value for dimension, value in selections.items() if dimension}
+        )
         
         # Креирање на две колони за визуелизации
         col1, col2 = st.columns(2)
         
         with col1:
             # Дистрибуција по тип на инструмент
-            instrument_col = next((col for col in filtered_data.columns 
-                                 if 'вид' in str(col).lower() and 'х.в.' in str(col).lower()), None)
+            instrument_col = cube.instrument
             if instrument_col:
                 st.subheader("📊 Дистрибуција по тип на инструмент")
-                instrument_counts = filtered_data[instrument_col].value_counts()
+                instrument_counts = cube.counts(instrument_col, cube_cells)
                 if not instrument_counts.empty:
                     fig = px.pie(
                         values=instrument_counts.values,
                         names=instrument_counts.index.astype(str),
                         title='Дистрибуција на хартии од вредност по тип'
                     )
+                    st.plotly_chart(fig, use_container_width=True)
         
         with col2:
             # Топ известувачи
-            reporter_col = next((col for col in filtered_data.columns 
-                               if 'известувач' in str(col).lower()), None)
+            reporter_col = cube.reporter
             if reporter_col:
                 st.subheader("📈 Топ известувачи")
-                # Чистење и подготовка на податоците за известувачи
-                reporter_data = filtered_data[reporter_col].dropna()
-                if not reporter_data.empty:
-                    reporter_counts = reporter_data.value_counts().head(10)
+                reporter_counts = cube.counts(reporter_col, cube_cells).head(10)
+                if not reporter_counts.empty:
                     reporter_df = pd.DataFrame({
                         'Известувач': reporter_counts.index.astype(str),
                         'Број': reporter_counts.values
@@ -173,6 +222,7 @@ if hasattr(st.session_state, 'isidora_report') and st.session_state.isidora_repo
                         yaxis={'categoryorder': 'total ascending'},
                         showlegend=False
                     )
+                    st.plotly_chart(fig, use_container_width=True)
         
         # Табела со податоци
         st.subheader("📋 Детален преглед на податоци")
@@ -186,16 +236,12 @@ if hasattr(st.session_state, 'isidora_report') and st.session_state.isidora_repo
         )
         
         if selected_columns:
-            st.dataframe(
-                filtered_data[selected_columns],
-                height=400,
-                use_container_width=True
-            )
+            paginated_grid(filtered_data, key="detail_grid", columns=selected_columns, height=400)
         
         # Сумарна статистика
         st.subheader("📊 Сумарна статистика")
         try:
-            summary = summarize_data(filtered_data)
+            summary = cube.summary(cube_cells)
             
             # Прикажување на статистиката во три колони
             summary_col1, summary_col2, summary_col3 = st.columns(3)
@@ -213,45 +259,147 @@ if hasattr(st.session_state, 'isidora_report') and st.session_state.isidora_repo
 
         # Прв Тест Пакет секција (само за листот 'Примени податоци')
         if 'selected_sheet' in locals() and selected_sheet.strip() == 'Примени податоци':
+            # Секцијата останува отворена при промена на страната во табелите
             if st.button("Прв Тест Пакет"):
+                st.session_state.show_first_packet = True
+            if st.session_state.get("show_first_packet"):
                 st.subheader("📦 Прв Тест Пакет (Табела)")
 
+                # Позиции на крај на периодот: состојбата во датотеката е состојбата на крај,
+                # се зачувува еднаш по датотека, а почетокот е зачуваната состојба на крај
+                # на претходниот период
+                prior_stamp = None
                 try:
-                    result = prepare_sostojba_na_hv(filtered_data)
-                    calculated_sum = f"{result['sum_in_denars']:,} денари"
-                    used_types = ", ".join(result['used_types'])
+                    position_store = default_position_store()
+                    if st.session_state.get("positions_for") != st.session_state.get("loaded_sheet"):
+                        st.session_state.period = period_of(st.session_state.isidora_report.data)
+                        position_store.ingest(st.session_state.period, st.session_state.isidora_report.data,
+                                              open_workbook(uploaded_file).digest)
+                        st.session_state.positions_for = st.session_state.get("loaded_sheet")
+                    period = st.session_state.period
+                    previous = position_store.previous_period(period)
+                    prior_stamp = (previous, position_store.digest(previous)) if previous else None
                 except Exception as e:
-                    calculated_sum = used_types = "❌ Error"
-                    result = {"filtered_df": pd.DataFrame()}
+                    st.warning(f"Позициите по периоди не се достапни: {str(e)}")
+
+                # Кодовите на Вид на износ за секој тек ги избира аналитичарот
+                with st.expander("⚙️ Кодови на Вид на износ за тековите"):
+                    amount_types = st.session_state.isidora_report.data["Вид на износ"].astype("category")
+                    flow_options = sorted(str(code) for code in amount_types.cat.categories
+                                          if code not in STOCK_AMOUNT_TYPES)
+                    # Секој код припаѓа на најмногу еден тек
+                    flow_types = {}
+                    for flow in FLOWS:
+                        taken = {code for other in FLOWS if other != flow
+                                 for code in st.session_state.get(f"flow_types_{other}", [])}
+                        flow_types[flow] = st.multiselect(
+                            flow, [code for code in flow_options if code not in taken], key=f"flow_types_{flow}"
+                        )
+
+                # Пакетот се пресметува повторно само кога ќе се сменат листот, филтрите, кодовите
+                # или претходниот период, а не при секое повторно извршување (на пр. страна во табела)
+                stock_flow_key = (st.session_state.get("loaded_sheet"), active_dates, active_reporter,
+                                  active_instrument, tuple(tuple(codes) for codes in flow_types.values()),
+                                  prior_stamp)
+                if st.session_state.get("stock_flow_for") != stock_flow_key:
+                    try:
+                        prior = position_store.opening_positions(period) if prior_stamp else None
+                        # Во филтриран преглед позициите надвор од филтерот не се затворени
+                        result = compute_stock_flow(
+                            filtered_data, flow_types, opening=prior,
+                            keep_closed=len(filtered_data) == len(st.session_state.isidora_report.data)
+                        )
+                        result["breakdown"] = result["filtered_df"].groupby("Вид на износ", observed=True).agg(
+                            Број_на_редови=("Вид на износ", "count"),
+                            Вкупно_износ_во_денари=("Износ во денари", "sum")
+                        ).reset_index()
+                        st.session_state.stock_flow = result
+                        st.session_state.stock_flow_for = stock_flow_key
+                    except Exception as e:
+                        st.error(f"Грешка при пресметка на пакетот: {str(e)}")
+                        st.session_state.stock_flow = {
+                            "filtered_df": pd.DataFrame(columns=["Вид на износ", "Износ во денари"]),
+                            "available": [], "totals": pd.Series(dtype=float), "identity_checked": False,
+                            "violations": pd.DataFrame(), "breakdown": pd.DataFrame()
+                        }
+                        st.session_state.stock_flow_for = None
+                result = st.session_state.stock_flow
 
                 placeholder = "⏳ Yet"
+                codes_by_component = {OPENING: ["крај на претходниот период"]}
+                for code, component in component_of_amount_type(flow_types).items():
+                    codes_by_component.setdefault(component, []).append(code)
 
-                # Build the main table
-                table = pd.DataFrame({
-                    "Состојба на х.в на почеток на период (главнина)": [calculated_sum, calculated_sum, used_types],
-                    "Нето трансакции": [placeholder, placeholder, placeholder],
-                    "Ценовни промени": [placeholder, placeholder, placeholder],
-                    "Курсни разлики": [placeholder, placeholder, placeholder],
-                    "Останати промени": [placeholder, placeholder, placeholder],
-                    "Состојба на х.в на крај на период (главнина)": [placeholder, placeholder, placeholder],
-                }, index=["Rule", "Износ во денари", "Вид на износ"])
+                # Build the main table: every column from the same grouped pass
+                table = {}
+                for component in COMPONENTS:
+                    if component in result["available"]:
+                        amount = f"{result['totals'].get(component, 0):,.0f} денари"
+                        table[component] = [amount, amount, ", ".join(codes_by_component.get(component, []))]
+                    else:
+                        table[component] = [placeholder, placeholder, placeholder]
+                st.table(pd.DataFrame(table, index=["Rule", "Износ во денари", "Вид на износ"]))
+                if OPENING not in result["available"]:
+                    st.caption("⏳ Состојбата на почеток е состојбата на крај од претходниот период; "
+                               "за овој период нема зачуван претходен период.")
+                if any(flow not in result["available"] for flow in FLOWS):
+                    st.caption("⏳ Тековите без избрани кодови на Вид на износ не се пресметуваат; "
+                               "равенката состојба-текови се проверува кога сите текови имаат кодови.")
 
-                st.table(table)
+                # Отпечатоци на записите: дупликати во датотеката и записи веќе доставени во претходен пакет.
+                # Датотеката се зачувува како доставена само со потврда, еднаш по содржина
+                try:
+                    report_data = st.session_state.isidora_report.data
+                    digest = open_workbook(uploaded_file).digest
+                    if st.session_state.get("fingerprints_for") != st.session_state.get("loaded_sheet"):
+                        st.session_state.fingerprints = row_fingerprints(report_data, FINGERPRINT_KEY)
+                        st.session_state.duplicate_rows = int(duplicate_mask(st.session_state.fingerprints).sum())
+                        st.session_state.fingerprints_for = st.session_state.get("loaded_sheet")
+                    fingerprints = st.session_state.fingerprints
+                    fingerprint_store = default_fingerprint_store()
+                    # Споредбата со претходните пакети се повторува само по нов запишан пакет
+                    seen_key = (st.session_state.get("loaded_sheet"), fingerprint_store.stamp())
+                    if st.session_state.get("resubmitted_for") != seen_key:
+                        st.session_state.resubmitted = fingerprint_store.seen(fingerprints, exclude=digest)
+                        st.session_state.resubmitted_for = seen_key
+                    resubmitted = st.session_state.resubmitted
+                    dup_col1, dup_col2 = st.columns(2)
+                    with dup_col1:
+                        st.metric("Дупликати во датотеката", f"{st.session_state.duplicate_rows:,}")
+                    with dup_col2:
+                        st.metric("Записи од претходни пакети", f"{int(resubmitted.notna().sum()):,}")
+                    if resubmitted.notna().any():
+                        with st.expander("🔁 Повторно доставени записи"):
+                            repeated = report_data.loc[resubmitted.notna().to_numpy(), FINGERPRINT_KEY].copy()
+                            repeated["Претходно во"] = resubmitted[resubmitted.notna()].to_numpy()
+                            st.dataframe(repeated, use_container_width=True)
+                    if fingerprint_store.ingested(digest):
+                        st.caption("Оваа датотека е веќе запишана како доставен пакет.")
+                    elif st.button("📨 Потврди доставување на пакетот"):
+                        fingerprint_store.ingest(digest, fingerprints, name=uploaded_file.name)
+                        st.success("Записите од пакетот се зачувани за проверка на идните пакети.")
+                except Exception as e:
+                    st.warning(f"Проверката за дупликати не е достапна: {str(e)}")
+
+                if result["identity_checked"]:
+                    if result["violations"].empty:
+                        st.success("✅ Состојба на крај = почеток + текови за сите позиции.")
+                    else:
+                        st.warning(f"⚠️ {len(result['violations'])} позиции не ја исполнуваат равенката состојба-текови.")
+                        paginated_grid(result["violations"], key="violations_grid")
 
                 # Verification table: Show filtered rows
                 st.subheader("🔎 Филтрирани редови за проверка (DRVR, DSK, PRM, POBJ)")
-                st.dataframe(result["filtered_df"])
+                paginated_grid(result["filtered_df"], key="packet_rows_grid")
 
                 # Optional: add a count sanity check
                 st.success(f"✅ Филтрирани {len(result['filtered_df'])} редови вкупно за пресметка.")
 
                 # Optional: breakdown by type
                 st.subheader("📈 Поделба по Вид на Износ")
-                breakdown = result["filtered_df"].groupby("Вид на износ").agg(
-                    Број_на_редови=("Вид на износ", "count"),
-                    Вкупно_износ_во_денари=("Износ во денари", "sum")
-                ).reset_index()
-                breakdown["Вкупно_износ_во_денари"] = breakdown["Вкупно_износ_во_денари"].map('{:,.0f} денари'.format)
+                breakdown = result["breakdown"].copy()
+                if not breakdown.empty:
+                    breakdown["Вкупно_износ_во_денари"] = breakdown["Вкупно_износ_во_денари"].map('{:,.0f} денари'.format)
                 st.dataframe(breakdown)
 
                 # Debug section for DRVR sum discrepancy
@@ -261,6 +409,18 @@ if hasattr(st.session_state, 'isidora_report') and st.session_state.isidora_repo
                 st.write("Sample DRVR values:", drvr_df["Износ во денари"].head(20))
                 st.write("DRVR min/max:", drvr_df["Износ во денари"].min(), drvr_df["Износ во денари"].max())
                 st.write("DRVR duplicates:", drvr_df.duplicated().sum())
+
+        # Време, редови и меморија по фаза за последните вчитувања и извози
+        with st.expander("⏱️ Фази на обработка"):
+            traces = recent_traces()
+            if traces:
+                st.dataframe(traces_frame(traces), use_container_width=True, hide_index=True)
+                chosen = st.selectbox(
+                    "Детали за",
+                    range(len(traces)),
+                    format_func=lambda i: f"{traces[i].operation} – {traces[i].source or ''}"
+                )
+                st.dataframe(steps_frame(traces[chosen].steps), use_container_width=True, hide_index=True)
     
     except Exception as e:
         st.error(f"Грешка при прикажување на податоците: {str(e)}")
@@ -1,6 +1,22 @@
 import pandas as pd
-import pyodbc
 import streamlit as st
+from workbook import open_workbook
+from reference_data import default_store
+from normalize import map_values
+from fuzzy_match import NameIndex, suggest_matches
+
+# Index over the SQL company names, rebuilt only when the snapshot is refreshed
+_company_index = (None, None)
+
+def get_company_name_index() -> NameIndex:
+    """N-gram index over the company names in the local vwDanocni_num snapshot."""
+    global _company_index
+    store = default_store()
+    company_names = store.company_names()
+    refreshed_at = store.refreshed_at('company_names')
+    if _company_index[0] != refreshed_at:
+        _company_index = (refreshed_at, NameIndex(company_names.items()))
+    return _company_index[1]
 
 def process_excel_mapping(excel_file):
     """
@@ -14,22 +30,19 @@ def process_excel_mapping(excel_file):
         DataFrame with matched матичен број values and company names
     """
     try:
-        # Load both sheets
-        main_df = pd.read_excel(excel_file, sheet_name='Примени податоци')
-        reporters_df = pd.read_excel(excel_file, sheet_name='листа известувачи')
+        # Load both sheets (shared with the other stages of the same upload)
+        workbook = open_workbook(excel_file)
+        main_df = workbook.sheet('Примени податоци')
+        reporters_df = workbook.sheet('листа известувачи')
         
-        # Clean and normalize company names for matching
-        main_df['Известувач'] = main_df['Известувач'].astype(str).str.strip().str.upper()
-        reporters_df['Опис МК'] = reporters_df['Опис МК'].astype(str).str.strip().str.upper()
-        
-        # Convert матичен број to integer, removing any decimals
-        reporters_df['матичен број'] = pd.to_numeric(reporters_df['матичен број'], errors='coerce').fillna(0).astype(int)
+        # Company names are cleaned and матичен број converted to integer by the
+        # sheet schema, as the sheets are parsed
         
         # Create mapping dictionary from cleaned names to integer матичен број
         opis_to_maticen = dict(zip(reporters_df['Опис МК'], reporters_df['матичен број']))
         
         # Map company names to get матичен број
-        main_df['Матичен број на известувач'] = main_df['Известувач'].map(opis_to_maticen)
+        main_df['Матичен број на известувач'] = map_values(main_df['Известувач'], opis_to_maticen)
         
         # Calculate mapping success rate
         total_rows = len(main_df)
@@ -47,9 +60,14 @@ def process_excel_mapping(excel_file):
                 st.warning("Companies without matching матичен број:")
                 st.write(missing_mappings)
                 
-                # Show available mappings for reference
-                st.info("Available mappings in листа известувачи:")
-                st.write(reporters_df[['Опис МК', 'матичен број']].head())
+                # Ranked candidates from листа известувачи and the SQL company names
+                indexes = {'листа известувачи': NameIndex(zip(reporters_df['матичен број'], reporters_df['Опис МК']))}
+                try:
+                    indexes['SQL'] = get_company_name_index()
+                except Exception as e:
+                    st.warning(f"SQL company names unavailable for matching: {str(e)}")
+                st.info("Closest candidates for the unmatched companies:")
+                st.dataframe(suggest_matches(missing_mappings, indexes))
         
         return main_df
         
@@ -59,26 +77,15 @@ def process_excel_mapping(excel_file):
 
 def get_company_names_from_sql():
     """
-    Retrieve company names from SQL database.
+    Retrieve company names from the local snapshot of the SQL database.
     
     Returns:
         dict: Mapping from матичен број (as integer) to full company name
     """
-    conn_str = r'DRIVER={ODBC Driver 17 for SQL Server};SERVER=isql2012;DATABASE=Sifri;Trusted_Connection=yes;'
-    
     try:
-        with pyodbc.connect(conn_str) as conn:
-            query = 'SELECT [Matbr_stat], [Poln_naziv_DO] FROM [dbo].[vwDanocni_num]'
-            danocni_df = pd.read_sql(query, conn)
-            
-            # Convert Matbr_stat to integer
-            danocni_df['Matbr_stat'] = pd.to_numeric(danocni_df['Matbr_stat'], errors='coerce').fillna(0).astype(int)
-            danocni_df['Poln_naziv_DO'] = danocni_df['Poln_naziv_DO'].astype(str).str.strip()
-            
-            # Create mapping dictionary with integer keys
-            matbr_to_poln_naziv = dict(zip(danocni_df['Matbr_stat'], danocni_df['Poln_naziv_DO']))
-            
-            return matbr_to_poln_naziv
+        # Snapshot of vwDanocni_num, refreshed in the background when stale
+        company_names = default_store().company_names()
+        return {matbr: str(naziv).strip() for matbr, naziv in company_names.items()}
     except Exception as e:
         st.error(f"Error connecting to SQL database: {str(e)}")
         return {}
@@ -0,0 +1,91 @@
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+
+def find_column(columns: Sequence, *terms: str) -> Optional[str]:
+    """First column whose lower-cased name contains every term, the way the dashboard picks them."""
+    return next((col for col in columns if all(term in str(col).lower() for term in terms)), None)
+
+
+def value_columns(columns: Sequence) -> List[str]:
+    """Columns summed by summarize_data: names containing 'вредност' or 'износ'."""
+    return [col for col in columns if any(term in str(col).lower() for term in ['вредност', 'износ'])]
+
+
+class MetricsCube:
+    """
+    Row counts and amount sums pre-aggregated over the dashboard dimensions.
+
+    Built once per loaded dataset with a single groupby over reporter ×
+    instrument type × Вид на износ × date (those that exist). Metrics, chart
+    counts and filter combinations are then answered from the cube, whose size
+    is bounded by the number of distinct combinations rather than rows.
+    """
+
+    def __init__(self, df: pd.DataFrame):
+        self.reporter = find_column(df.columns, 'известувач')
+        self.instrument = find_column(df.columns, 'вид', 'х.в.')
+        self.date = find_column(df.columns, 'датум')
+        candidates = [self.reporter, 'Матичен број на известувач', self.instrument, 'Вид на х.в. (ЕСА2010)',
+                      'Вид на износ', self.date]
+        self.dimensions = list(dict.fromkeys(col for col in candidates if col and col in df.columns))
+
+        values = {}
+        for col in value_columns(df.columns):
+            try:
+                values[col] = pd.to_numeric(df[col], errors='coerce')
+            except (TypeError, ValueError):
+                continue
+        frame = pd.DataFrame({col: df[col] for col in self.dimensions}, index=df.index)
+        frame = frame.assign(_rows=1, **{f'_sum{i}': v for i, v in enumerate(values.values())})
+        self.value_columns = list(values)
+        self.totals = {col: f'_sum{i}' for i, col in enumerate(self.value_columns)}
+
+        if self.dimensions:
+            self.cells = frame.groupby(self.dimensions, observed=True, dropna=False, sort=False).sum().reset_index()
+        else:
+            self.cells = frame.sum().to_frame().T
+
+    def __len__(self) -> int:
+        return len(self.cells)
+
+    def members(self, dimension: str) -> list:
+        """Sorted distinct non-missing values of a dimension."""
+        return sorted(self.cells[dimension].dropna().unique())
+
+    def slice(self, date_range=None, **equals) -> pd.DataFrame:
+        """
+        Cells matching a filter combination.
+
+        ``date_range`` is an inclusive (start, end) pair on the date dimension;
+        ``equals`` maps a dimension to a value, where None or 'Сите' means any.
+        """
+        mask = np.ones(len(self.cells), dtype=bool)
+        if date_range is not None and self.date:
+            dates = pd.to_datetime(self.cells[self.date], errors='coerce')
+            mask &= ((dates >= pd.Timestamp(date_range[0])) & (dates <= pd.Timestamp(date_range[1]))).to_numpy()
+        for dimension, value in equals.items():
+            if dimension and value is not None and value != 'Сите':
+                mask &= (self.cells[dimension] == value).to_numpy()
+        return self.cells[mask]
+
+    def summary(self, cells: Optional[pd.DataFrame] = None) -> Dict:
+        """The summarize_data dictionary, computed from cube cells."""
+        cells = self.cells if cells is None else cells
+        summary = {'вкупно_записи': int(cells['_rows'].sum())}
+        if 'Матичен број на известувач' in self.dimensions:
+            summary['број_известувачи'] = cells['Матичен број на известувач'].nunique()
+        if 'Вид на х.в. (ЕСА2010)' in self.dimensions:
+            summary['број_инструменти'] = cells['Вид на х.в. (ЕСА2010)'].nunique()
+        for col, total in self.totals.items():
+            summary[f'вкупна_{col}'] = cells[total].sum()
+        return summary
+
+    def counts(self, dimension: str, cells: Optional[pd.DataFrame] = None) -> pd.Series:
+        """Row counts per dimension value, largest first, like value_counts()."""
+        cells = self.cells if cells is None else cells
+        counts = cells.groupby(dimension, observed=True)['_rows'].sum()
+        counts = counts[counts > 0].sort_values(ascending=False, kind='stable')
+        return counts.rename('count')
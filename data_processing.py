@@ -1,36 +1,68 @@
 import pandas as pd
-import pyodbc
 import streamlit as st
-from typing import Dict, Tuple, Optional
-import numpy as np
-
-REQUIRED_COLUMNS = [
-    'Известувач', 'Вид на износ', 'Износ во денари', 'Пакет',
-    'Извештаен датум', 'Позиција', 'Идентификатор на хартија од вредност',
-    'Алфанумеричка ознака на хартија од вредност', 'Котација',
-    'Тип на договорна страна',
-    'Земја',
-    'Сектор',
-    'Идентификациски код на договорна страна'
+from typing import Callable, Dict, List, Tuple, Optional
+import contextvars
+from functools import partial
+import os
+from concurrent.futures import Future, ThreadPoolExecutor
+from workbook import open_workbook
+from streaming import DEFAULT_CHUNK_SIZE, iter_sheet_chunks
+from reference_data import SqlServerBackend, default_store
+from normalize import CATEGORICAL_COLUMNS, map_values, normalize_categoricals
+from pipeline import Stage, StageGraph, StageMemo, StageRun
+from instrumentation import Step, annotate, step, trace
+from rules import Copy, FlagSet, KeyLookup, Select, ValueMap
+from packets import PACKET_PROCESSORS, PacketProcessor, PacketResult, register, registered_packets, split_packets
+from schema import SHEET_SCHEMAS, arrow_compatible
+
+# Column projection and types of the sheets are declared in schema.SHEET_SCHEMAS
+REQUIRED_COLUMNS = SHEET_SCHEMAS['Примени податоци'].usecols
+REPORTER_COLUMNS = SHEET_SCHEMAS['листа известувачи'].usecols
+
+# Values of 'Пакет' that make up the First Packet
+FIRST_PACKETS = ['PHoV', 'AHoV']
+
+# Derived First Packet columns, in output order. New columns are added here as data.
+FIRST_PACKET_RULES = [
+    FlagSet('Код (A/L)', 'Позиција', flags=['A', 'L']),
+    # Securities identifiers
+    Select(
+        'Ознака на х.в. (ИСИН)',
+        conditions=[
+            {'Идентификатор на хартија од вредност': 'ISIN'},
+            {'Идентификатор на хартија од вредност': 'OTID', 'Котација': 'KT'},
+        ],
+        choices=['Алфанумеричка ознака на хартија од вредност'] * 2
+    ),
+    Select(
+        'Ознака на х.в. (тикер)',
+        conditions=[{'Идентификатор на хартија од вредност': 'OTID', 'Котација': 'KT'}],
+        choices=['Алфанумеричка ознака на хартија од вредност']
+    ),
+    # Тип на договорна страна (R/N rule)
+    ValueMap(
+        'Тип на договорна страна (R/N)', 'Тип на договорна страна',
+        mapping={'RL': 'R', 'RI': 'R', 'RS': 'R', 'NL': 'N', 'NI': 'N', 'NS': 'N'}
+    ),
+    Copy('Држава на издавач на х.в. (договорна страна)', 'Земја'),
+    # Институционален сектор from TblSektor, for numeric counterparty codes
+    KeyLookup('Институционален сектор на договорна страна',
+              'Идентификациски код на договорна страна', lookup='sectors'),
 ]
 
-def get_sql_connection() -> pyodbc.Connection:
+FIRST_PACKET = register(PacketProcessor('First Packet', FIRST_PACKETS, FIRST_PACKET_RULES))
+
+# Column types applied to every chunk in streaming mode
+STREAM_TYPES = SHEET_SCHEMAS['Примени податоци'].types
+
+def get_sql_connection():
     """Get SQL Server connection."""
-    return pyodbc.connect(
-        r'DRIVER={ODBC Driver 17 for SQL Server};'
-        'SERVER=isql2012;DATABASE=Sifri;Trusted_Connection=yes;'
-    )
+    return SqlServerBackend().connect()
 
-@st.cache_data
 def load_sql_mappings() -> Dict[int, str]:
-    """Load only required company mappings from SQL database."""
+    """Load company mappings from the local reference-data snapshot."""
     try:
-        with get_sql_connection() as conn:
-            # Load only company names mapping
-            company_query = 'SELECT [Matbr_stat], [Poln_naziv_DO] FROM [dbo].[vwDanocni_num]'
-            company_df = pd.read_sql(company_query, conn)
-            company_df['Matbr_stat'] = pd.to_numeric(company_df['Matbr_stat'], errors='coerce').fillna(0).astype(int)
-            return dict(zip(company_df['Matbr_stat'], company_df['Poln_naziv_DO']))
+        return default_store().company_names()
     except Exception as e:
         st.error(f"Error loading SQL mappings: {str(e)}")
         return {}
@@ -39,24 +71,14 @@ def load_sql_mappings() -> Dict[int, str]:
 def load_excel_mappings(excel_file) -> Tuple[pd.DataFrame, Dict[str, int]]:
     """Load only required Excel mappings efficiently."""
     try:
+        workbook = open_workbook(excel_file)
+
         # Load main sheet with only required columns
-        main_df = pd.read_excel(
-            excel_file, 
-            sheet_name='Примени податоци',
-            usecols=REQUIRED_COLUMNS
-        )
-        
-        # Load only needed columns from листа известувачи
-        reporters_df = pd.read_excel(
-            excel_file, 
-            sheet_name='листа известувачи',
-            usecols=['Опис МК', 'матичен број']
-        )
+        main_df = workbook.sheet('Примени податоци', usecols=REQUIRED_COLUMNS)
         
-        # Clean and normalize company names
-        main_df['Известувач'] = main_df['Известувач'].astype(str).str.strip().str.upper()
-        reporters_df['Опис МК'] = reporters_df['Опис МК'].astype(str).str.strip().str.upper()
-        reporters_df['матичен број'] = pd.to_numeric(reporters_df['матичен број'], errors='coerce').fillna(0).astype(int)
+        # Load only needed columns from листа известувачи; names are cleaned and
+        # матичен број typed by the sheet schema as the sheets are parsed
+        reporters_df = workbook.sheet('листа известувачи', usecols=REPORTER_COLUMNS)
         
         # Create mapping dictionary
         opis_to_maticen = dict(zip(reporters_df['Опис МК'], reporters_df['матичен број']))
@@ -66,89 +88,268 @@ def load_excel_mappings(excel_file) -> Tuple[pd.DataFrame, Dict[str, int]]:
         st.error(f"Error loading Excel mappings: {str(e)}")
         return pd.DataFrame(), {}
 
-def process_first_packet(excel_file) -> pd.DataFrame:
-    """Process First Packet data efficiently."""
-    try:
-        # Load main data with required columns
-        df = pd.read_excel(excel_file, sheet_name='Примени податоци', usecols=REQUIRED_COLUMNS)
-        reporters_df = pd.read_excel(excel_file, sheet_name='листа известувачи', usecols=['Опис МК', 'матичен број'])
-        
-        # Clean company names
-        df['Известувач'] = df['Известувач'].astype(str).str.strip().str.upper()
-        reporters_df['Опис МК'] = reporters_df['Опис МК'].astype(str).str.strip().str.upper()
-        reporters_df['матичен број'] = pd.to_numeric(reporters_df['матичен број'], errors='coerce').fillna(0).astype(int)
-        
-        # Get company mapping
-        opis_to_maticen = dict(zip(reporters_df['Опис МК'], reporters_df['матичен број']))
-        
-        # Get SQL mapping
-        conn = pyodbc.connect(r'DRIVER={ODBC Driver 17 for SQL Server};SERVER=isql2012;DATABASE=Sifri;Trusted_Connection=yes;')
-        company_df = pd.read_sql('SELECT [Matbr_stat], [Poln_naziv_DO] FROM [dbo].[vwDanocni_num]', conn)
-        company_df['Matbr_stat'] = pd.to_numeric(company_df['Matbr_stat'], errors='coerce').fillna(0).astype(int)
-        company_mapping = dict(zip(company_df['Matbr_stat'], company_df['Poln_naziv_DO']))
-        
-        # Load sector mapping from TblSektor
-        sektor_df = pd.read_sql('SELECT [Matbr], [Sektor] FROM [dbo].[TblSektor]', conn)
-        sektor_df['Matbr'] = pd.to_numeric(sektor_df['Matbr'], errors='coerce').fillna(0).astype(int)
-        sektor_mapping = dict(zip(sektor_df['Matbr'], sektor_df['Sektor']))
-        conn.close()
-        
-        # Apply mappings
-        df['Матичен број на известувач'] = df['Известувач'].map(opis_to_maticen)
-        df['Назив на договорна страна'] = df['Матичен број на известувач'].map(company_mapping)
-        
-        # Process dates and codes
-        df['Датум'] = pd.to_datetime(df['Извештаен датум'], errors='coerce').dt.date
-        df['Година'] = pd.to_datetime(df['Извештаен датум'], errors='coerce').dt.year
-        df['Код (A/L)'] = df['Позиција'].apply(
-            lambda pos: ', '.join([l for l in ['A', 'L'] if pd.notna(pos) and l in str(pos)]) 
-            if pd.notna(pos) and any(l in str(pos) for l in ['A', 'L']) else '-'
+def packet_reference_keys(df: pd.DataFrame, opis_to_maticen: Dict[str, int]) -> Tuple[set, set]:
+    """Distinct reporter матични броеви and numeric counterparty codes present in packet rows."""
+    reporter_keys = {opis_to_maticen.get(str(name).strip().upper()) for name in df['Известувач'].unique()}
+    reporter_keys.discard(None)
+    sector_keys = {
+        int(code) for code in df['Идентификациски код на договорна страна'].dropna().unique()
+        if str(code).isdigit()
+    }
+    return reporter_keys, sector_keys
+
+def reporter_mapping(workbook) -> Dict[str, int]:
+    """Cleaned 'Опис МК' -> матичен број from the 'листа известувачи' sheet."""
+    # Names are cleaned and матичен број typed by the sheet schema
+    reporters_df = workbook.sheet('листа известувачи', usecols=REPORTER_COLUMNS)
+    return dict(zip(reporters_df['Опис МК'], reporters_df['матичен број']))
+
+def filter_packets(df: pd.DataFrame, packets: List[str] = FIRST_PACKETS) -> pd.DataFrame:
+    """Keep the rows of ``packets`` (PHoV and AHoV by default), so nothing is mapped for rows that are dropped."""
+    if 'Пакет' in df.columns:
+        return df[df['Пакет'].isin(packets)].copy()
+    return df.copy()
+
+# Stages below add columns to a shallow copy, so their input (possibly memoized) is left as it was
+
+def map_reporters(df: pd.DataFrame, opis_to_maticen: Dict[str, int]) -> pd.DataFrame:
+    """Add 'Матичен број на известувач' from the reporter list."""
+    df = df.copy(deep=False)
+    df['Матичен број на известувач'] = map_values(df['Известувач'], opis_to_maticen)
+    return df
+
+def map_companies(df: pd.DataFrame, company_mapping: Dict[int, str]) -> pd.DataFrame:
+    """Add 'Назив на договорна страна' from vwDanocni_num."""
+    df = df.copy(deep=False)
+    df['Назив на договорна страна'] = map_values(df['Матичен број на известувач'], company_mapping)
+    return df
+
+def derive_columns(df: pd.DataFrame, sektor_mapping: Dict[int, str]) -> pd.DataFrame:
+    """Add the date columns and the FIRST_PACKET_RULES columns."""
+    return FIRST_PACKET.build(df, {'sectors': sektor_mapping})
+
+def build_first_packet(df: pd.DataFrame,
+                       opis_to_maticen: Dict[str, int],
+                       company_mapping: Dict[int, str],
+                       sektor_mapping: Dict[int, str]) -> pd.DataFrame:
+    """Apply First Packet mappings, derived columns and the packet filter to main sheet rows."""
+    # Low-cardinality columns become categoricals; company names are cleaned once per name
+    df = filter_packets(normalize_categoricals(df))
+    df = map_companies(map_reporters(df, opis_to_maticen), company_mapping)
+    return derive_columns(df, sektor_mapping)
+
+def _reporter_company_names(opis_to_maticen: Dict[str, int], store) -> Dict[int, str]:
+    # Every listed reporter, so the query does not wait for the main sheet to be parsed
+    return store.lookup('company_names', {int(key) for key in opis_to_maticen.values() if key})
+
+def _sector_snapshot(store) -> Optional[Dict[int, str]]:
+    # Only a local snapshot can be read before the packet's counterparty codes are known
+    return store.sectors() if store.refreshed_at('sectors') is not None else None
+
+def _sectors_for(df: pd.DataFrame, snapshot: Optional[Dict[int, str]], store) -> Dict[int, str]:
+    if snapshot is not None:
+        return snapshot
+    _, sector_keys = packet_reference_keys(df, {})
+    return store.lookup('sectors', sector_keys)
+
+def _build_packet(processor: PacketProcessor, parts: Dict[str, pd.DataFrame],
+                  sektor_mapping: Dict[int, str]) -> pd.DataFrame:
+    return processor.build(parts[processor.name], {'sectors': sektor_mapping})
+
+def packet_graph(processors: Optional[List[PacketProcessor]] = None) -> StageGraph:
+    """
+    The registered packets as one stage graph; each stage is memoized on the keys of its inputs.
+
+    Reading, normalizing and the reporter, company and sector mappings run once
+    for the rows of every packet; one groupby on 'Пакет' then hands each
+    processor its rows ('packet <name>'), and 'packets' collects them all.
+    """
+    processors = list(PACKET_PROCESSORS.values()) if processors is None else processors
+    packets = registered_packets(processors)
+    stages = [
+        # The small reporter list is parsed first, so the company name query overlaps the main sheet parse
+        Stage('parse reporters', reporter_mapping, inputs=['workbook']),
+        Stage('fetch company names', _reporter_company_names, inputs=['parse reporters', 'company_names']),
+        Stage('fetch sectors', _sector_snapshot, inputs=['sectors']),
+        Stage('parse', lambda workbook: workbook.sheet('Примени податоци', usecols=REQUIRED_COLUMNS),
+              inputs=['workbook'], params=REQUIRED_COLUMNS),
+        Stage('normalize', lambda df: normalize_categoricals(df.copy(deep=False)),
+              inputs=['parse'], params=CATEGORICAL_COLUMNS),
+        Stage('filter packets', lambda df: filter_packets(df, packets), inputs=['normalize'], params=packets),
+        Stage('map reporters', map_reporters, inputs=['filter packets', 'parse reporters']),
+        Stage('map companies', map_companies, inputs=['map reporters', 'fetch company names']),
+        Stage('map sectors', _sectors_for, inputs=['filter packets', 'fetch sectors', 'sectors']),
+        Stage('split packets', lambda df: split_packets(df, processors), inputs=['map companies'],
+              params=[(processor.name, list(processor.packets)) for processor in processors]),
+    ]
+    outputs = []
+    for processor in processors:
+        stages.append(Stage(f'packet {processor.name}', partial(_build_packet, processor),
+                            inputs=['split packets', 'map sectors'], params=processor.rules))
+        summary = f'summary {processor.name}' if processor.aggregation is not None else None
+        if summary:
+            stages.append(Stage(summary, processor.summarize, inputs=[f'packet {processor.name}'],
+                                params=processor.aggregation))
+        outputs.append((processor.name, f'packet {processor.name}', summary))
+
+    results = [stage for output in outputs for stage in output[1:] if stage]
+
+    def collect(*values) -> Dict[str, PacketResult]:
+        by_stage = dict(zip(results, values))
+        return {name: PacketResult(by_stage[rows], by_stage.get(summary)) for name, rows, summary in outputs}
+
+    stages.append(Stage('packets', collect, inputs=results))
+    return StageGraph(stages)
+
+# Stage results shared by reruns of the app in this process
+STAGE_MEMO = StageMemo()
+
+# Threads running independent stages at the same time: sheet parsing overlaps the reference queries
+STAGE_WORKERS = int(os.environ.get('ISIDORA_STAGE_WORKERS', '4'))
+STAGE_POOL = ThreadPoolExecutor(max_workers=STAGE_WORKERS, thread_name_prefix='isidora-stage')
+
+def _submit(func, *args) -> Future:
+    """Run ``func`` on STAGE_POOL in a copy of this context, so its steps join the active trace."""
+    return STAGE_POOL.submit(contextvars.copy_context().run, func, *args)
+
+def run_packet_graph(workbook, target: str, memo: Optional[StageMemo] = None,
+                     on_stage: Optional[Callable[[str, int, int], None]] = None):
+    """Compute ``target`` of the packet graph for a workbook session; returns (result, stage runs)."""
+    store = default_store()
+    # A reference table's key changes when its snapshot is refreshed
+    return packet_graph().run(
+        target,
+        inputs={'workbook': workbook, 'company_names': store, 'sectors': store},
+        input_keys={
+            'workbook': workbook.digest,
+            'company_names': f"company_names@{store.refreshed_at('company_names')}",
+            'sectors': f"sectors@{store.refreshed_at('sectors')}",
+        },
+        memo=memo,
+        on_stage=on_stage,
+        executor=STAGE_POOL
+    )
+
+def run_first_packet_graph(workbook, memo: Optional[StageMemo] = None,
+                           on_stage: Optional[Callable[[str, int, int], None]] = None) -> Tuple[pd.DataFrame, List[StageRun]]:
+    """Run the packet graph up to the First Packet; returns (First Packet, stage runs)."""
+    return run_packet_graph(workbook, f'packet {FIRST_PACKET.name}', memo, on_stage)
+
+def load_first_packet(excel_file, streaming: bool = False,
+                      chunk_size: int = DEFAULT_CHUNK_SIZE,
+                      memo: Optional[StageMemo] = None,
+                      stage_log: Optional[List[StageRun]] = None,
+                      progress: Optional[Callable[[Optional[float], str], None]] = None) -> pd.DataFrame:
+    """
+    Process First Packet data efficiently, raising on errors.
+
+    With ``streaming=True`` the main sheet is read in chunks of ``chunk_size``
+    rows and only PHoV/AHoV rows of the required columns are ever materialised,
+    so peak memory depends on the chunk size instead of the file size.
+    Otherwise the packet graph runs up to the First Packet, reusing results from
+    ``memo``; their hit/miss status is appended to ``stage_log``.
+    Every run is recorded as a 'process_first_packet' instrumentation trace.
+    ``progress`` is called with (fraction done or None, message) before every
+    stage or chunk; a background job stops there when it is cancelled.
+    """
+    with trace('process_first_packet', source=excel_file, streaming=streaming):
+        workbook = open_workbook(excel_file)
+        annotate(digest=workbook.digest[:12])
+        if not streaming:
+            on_stage = (lambda name, done, total: progress(done / total, name)) if progress else None
+            df, runs = run_first_packet_graph(workbook, memo, on_stage)
+            if stage_log is not None:
+                stage_log.extend(runs)
+            return df
+
+        # The reporter list is parsed while the main sheet is being streamed
+        reporters = _submit(reporter_mapping, workbook)
+
+        # Company names (vwDanocni_num) and sectors (TblSektor): served from the local
+        # snapshot, or fetched for just this packet's keys while the snapshot is cold
+        store = default_store()
+
+        def build(rows: pd.DataFrame) -> pd.DataFrame:
+            opis_to_maticen = reporters.result()
+            with step('map chunk', rows_in=len(rows)) as record:
+                reporter_keys, sector_keys = packet_reference_keys(rows, opis_to_maticen)
+                company_mapping = store.lookup('company_names', reporter_keys)
+                sektor_mapping = store.lookup('sectors', sector_keys)
+                result = build_first_packet(rows, opis_to_maticen, company_mapping, sektor_mapping)
+                record.rows_out = len(result)
+            return result
+
+        chunks = iter_sheet_chunks(
+            workbook.stream(), 'Примени податоци',
+            usecols=REQUIRED_COLUMNS,
+            chunk_size=chunk_size,
+            row_filter={'Пакет': FIRST_PACKETS},
+            types=STREAM_TYPES
         )
-        
-        # Process securities identifiers
-        conditions = [
-            (df['Идентификатор на хартија од вредност'].str.strip().str.upper() == 'ISIN'),
-            (
-                (df['Идентификатор на хартија од вредност'].str.strip().str.upper() == 'OTID') & 
-                (df['Котација'].str.strip().str.upper() == 'KT')
-            )
-        ]
-        choices = [df['Алфанумеричка ознака на хартија од вредност']] * 2
-        
-        df['Ознака на х.в. (ИСИН)'] = np.select(conditions, choices, default='')
-        df['Ознака на х.в. (тикер)'] = np.select([conditions[1]], [choices[0]], default='')
-        
-        # Filter for PHoV and AHoV
-        if 'Пакет' in df.columns:
-            df = df[df['Пакет'].isin(['PHoV', 'AHoV'])]
-        
-        # Add new column for Тип на договорна страна (R/N rule)
-        def map_contract_type(val):
-            if str(val).strip().upper() in ['RL', 'RI', 'RS']:
-                return 'R'
-            elif str(val).strip().upper() in ['NL', 'NI', 'NS']:
-                return 'N'
-            else:
-                return ''
-        df['Тип на договорна страна (R/N)'] = df['Тип на договорна страна'].apply(map_contract_type)
-
-        # Add new column for Држава на издавач на х.в. (договорна страна)
-        df['Држава на издавач на х.в. (договорна страна)'] = df['Земја']
-
-        # Add new column for Институционален сектор на договорна страна
-        def get_institutional_sector(row):
-            ident_code = row.get('Идентификациски код на договорна страна')
-            if pd.notna(ident_code) and str(ident_code).isdigit() and int(ident_code) in sektor_mapping:
-                return sektor_mapping[int(ident_code)]
-            else:
-                return ''
-        df['Институционален сектор на договорна страна'] = df.apply(get_institutional_sector, axis=1)
-
-        return df
-        
-    except Exception as e:
-        st.error(f"Error in First Packet processing: {str(e)}")
-        return pd.DataFrame()
+        # Chunks are mapped (and their keys queried) on the stage pool while the next one is read
+        with step("stream 'Примени податоци'") as record:
+            futures, read = [], 0
+            try:
+                for chunk in chunks:
+                    read += len(chunk)
+                    if progress:
+                        # The sheet's length is not known until it has been read
+                        progress(None, f"{read:,} PHoV/AHoV rows read")
+                    futures.append(_submit(build, chunk))
+                reporters.result()  # raises a reporter list error even when no rows were read
+                parts = [future.result() for future in futures]
+            finally:
+                for future in futures:
+                    future.cancel()
+            record.rows_out = sum(len(part) for part in parts)
+        # Chunks have their own categories; re-align them on the combined frame. Mixed-type
+        # columns become text, as they are when the sheet is parsed whole
+        return normalize_categoricals(arrow_compatible(pd.concat(parts))) if parts else pd.DataFrame()
+
+def load_packets(excel_file, streaming: bool = False,
+                 chunk_size: int = DEFAULT_CHUNK_SIZE,
+                 memo: Optional[StageMemo] = None,
+                 stage_log: Optional[List[StageRun]] = None,
+                 progress: Optional[Callable[[Optional[float], str], None]] = None) -> Dict[str, PacketResult]:
+    """
+    Process every registered packet of an upload, raising on errors; results by processor name.
+
+    The shared stages run once for all packets, so this costs about as much
+    as load_first_packet. Streaming mode builds only the First Packet.
+    Arguments are as for load_first_packet.
+    """
+    if streaming:
+        df = load_first_packet(excel_file, streaming=True, chunk_size=chunk_size, progress=progress)
+        return {FIRST_PACKET.name: PacketResult(df)}
+    with trace('process_packets', source=excel_file):
+        workbook = open_workbook(excel_file)
+        annotate(digest=workbook.digest[:12])
+        on_stage = (lambda name, done, total: progress(done / total, name)) if progress else None
+        results, runs = run_packet_graph(workbook, 'packets', memo, on_stage)
+        if stage_log is not None:
+            stage_log.extend(runs)
+        return results
+
+def process_first_packet(excel_file, streaming: bool = False,
+                         chunk_size: int = DEFAULT_CHUNK_SIZE,
+                         stage_log: Optional[List[StageRun]] = None,
+                         steps: Optional[List[Step]] = None) -> pd.DataFrame:
+    """
+    Process First Packet data efficiently, reporting errors in the app; stages are memoized across reruns.
+
+    The instrumented steps of this run (time, rows, memory) are appended to ``steps``.
+    """
+    with trace('process_first_packet', source=excel_file, streaming=streaming) as current:
+        try:
+            df = load_first_packet(excel_file, streaming=streaming, chunk_size=chunk_size,
+                                   memo=STAGE_MEMO, stage_log=stage_log)
+        except Exception as e:
+            current.status, current.error = 'error', str(e)
+            st.error(f"Error in First Packet processing: {str(e)}")
+            df = pd.DataFrame()
+    if steps is not None:
+        steps.extend(current.steps)
+    return df
 
 def display_debug_info(df: pd.DataFrame) -> None:
     """Display debug information about the processed data."""
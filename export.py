@@ -0,0 +1,199 @@
+import gzip
+import os
+import tempfile
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+import pandas as pd
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Alignment, Border, Font, Side
+from openpyxl.utils import get_column_letter
+from schema import arrow_types
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # Parquet export is unavailable without pyarrow
+    pa = pq = None
+
+try:
+    import zstandard
+except ImportError:  # zstd-compressed CSV is unavailable without zstandard
+    zstandard = None
+
+# Rows converted to Python values at a time while writing
+EXPORT_CHUNK_ROWS = 10_000
+# Rows sampled, evenly spaced, to estimate column widths
+WIDTH_SAMPLE_ROWS = 1_000
+# Excel's maximum column width
+MAX_COLUMN_WIDTH = 255
+
+
+def column_widths(df: pd.DataFrame, sample_rows: int = WIDTH_SAMPLE_ROWS) -> List[int]:
+    """Width per column: longest header or value in an evenly spaced sample of rows, plus padding."""
+    step = max(len(df) // sample_rows, 1)
+    sample = df.iloc[::step].head(sample_rows)
+    widths = []
+    for position, column in enumerate(df.columns):
+        values = sample.iloc[:, position]
+        longest = values.astype(str).str.len().max() if len(values) else 0
+        widths.append(min(max(int(longest or 0), len(str(column))) + 2, MAX_COLUMN_WIDTH))
+    return widths
+
+
+def _rows(df: pd.DataFrame, chunk_rows: int):
+    """Rows as lists of Python values with missing values as None, one chunk in memory at a time."""
+    for start in range(0, len(df), chunk_rows):
+        chunk = df.iloc[start:start + chunk_rows]
+        values = chunk.astype(object).to_numpy()
+        values[chunk.isna().to_numpy()] = None
+        yield from values.tolist()
+
+
+def _append_sheet(workbook: Workbook, df: pd.DataFrame, sheet_name: str, chunk_rows: int) -> None:
+    sheet = workbook.create_sheet(sheet_name)
+    # Widths must be set before the first row is written
+    for position, width in enumerate(column_widths(df), 1):
+        sheet.column_dimensions[get_column_letter(position)].width = width
+
+    thin = Side(style='thin')
+    header = []
+    for column in df.columns:
+        cell = WriteOnlyCell(sheet, value=str(column))
+        cell.font = Font(bold=True)
+        cell.border = Border(left=thin, right=thin, top=thin, bottom=thin)
+        cell.alignment = Alignment(horizontal='center', vertical='top')
+        header.append(cell)
+    sheet.append(header)
+
+    for row in _rows(df, chunk_rows):
+        sheet.append(row)
+
+
+def write_workbook(sheets: Dict[str, pd.DataFrame], target,
+                   chunk_rows: int = EXPORT_CHUNK_ROWS) -> None:
+    """Write several frames, one sheet each in order, to one .xlsx file with a write-only workbook."""
+    workbook = Workbook(write_only=True)
+    for sheet_name, df in sheets.items():
+        _append_sheet(workbook, df, sheet_name, chunk_rows)
+    workbook.save(target)
+
+
+def write_xlsx(df: pd.DataFrame, target, sheet_name: str = 'Sheet1',
+               chunk_rows: int = EXPORT_CHUNK_ROWS) -> None:
+    """
+    Write ``df`` to an .xlsx file or binary file object with a write-only workbook.
+
+    Rows are streamed to the file as they are appended, so memory stays bounded
+    by ``chunk_rows`` rather than the size of the frame. The header is styled
+    like DataFrame.to_excel and columns are sized from a bounded sample.
+    """
+    write_workbook({sheet_name: df}, target, chunk_rows=chunk_rows)
+
+
+@dataclass
+class ExportFormat:
+    label: str
+    suffix: str
+    mime: str
+
+
+EXPORT_FORMATS: Dict[str, ExportFormat] = {
+    'parquet': ExportFormat('Parquet', '.parquet', 'application/vnd.apache.parquet'),
+    'csv.zst': ExportFormat('CSV (zstd)', '.csv.zst', 'application/zstd'),
+    'csv.gz': ExportFormat('CSV (gzip)', '.csv.gz', 'application/gzip'),
+    'csv': ExportFormat('CSV', '.csv', 'text/csv'),
+    'xlsx': ExportFormat('Excel', '.xlsx', 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'),
+}
+
+
+def available_formats() -> List[str]:
+    """Export formats whose optional dependencies are installed."""
+    missing = {'parquet': pq is None, 'csv.zst': zstandard is None}
+    return [name for name in EXPORT_FORMATS if not missing.get(name)]
+
+
+def format_for_filename(filename: str) -> str:
+    """Export format from a file name's suffix, e.g. 'report.csv.gz' -> 'csv.gz'."""
+    matches = [name for name, fmt in EXPORT_FORMATS.items() if str(filename).lower().endswith(fmt.suffix)]
+    if not matches:
+        raise ValueError(f"Unknown export format for {filename}; expected one of {list(EXPORT_FORMATS)}")
+    return max(matches, key=lambda name: len(EXPORT_FORMATS[name].suffix))
+
+
+def write_csv(df: pd.DataFrame, target: str, compression: Optional[str] = None,
+              chunk_rows: int = EXPORT_CHUNK_ROWS) -> None:
+    """Write ``df`` as UTF-8 (with BOM, for Excel) CSV, encoding one chunk of rows at a time."""
+    if compression == 'gzip':
+        handle = gzip.open(target, 'wt', encoding='utf-8-sig', newline='')
+    elif compression == 'zstd':
+        if zstandard is None:
+            raise ImportError("zstd-compressed CSV needs the zstandard package")
+        handle = zstandard.open(target, 'wt', encoding='utf-8-sig', newline='')
+    else:
+        handle = open(target, 'w', encoding='utf-8-sig', newline='')
+    with handle:
+        for start in range(0, max(len(df), 1), chunk_rows):
+            df.iloc[start:start + chunk_rows].to_csv(handle, header=start == 0, index=False)
+
+
+def write_parquet(df: pd.DataFrame, target: str, chunk_rows: int = EXPORT_CHUNK_ROWS * 10) -> None:
+    """Write ``df`` as zstd-compressed Parquet, one row group per chunk of rows."""
+    if pq is None:
+        raise ImportError("Parquet export needs the pyarrow package")
+    # Mixed-type object columns (e.g. numeric and LEI codes) are written as strings
+    types = arrow_types(df)
+    writer = None
+    try:
+        for start in range(0, max(len(df), 1), chunk_rows):
+            chunk = df.iloc[start:start + chunk_rows].astype(types)
+            if writer is None:
+                schema = pa.Schema.from_pandas(chunk, preserve_index=False)
+                # A column that is all-missing in the first chunk takes its type from the data
+                for i, field in enumerate(schema):
+                    if pa.types.is_null(field.type):
+                        schema = schema.set(i, field.with_type(pa.string()))
+                writer = pq.ParquetWriter(target, schema, compression='zstd')
+            writer.write_table(pa.Table.from_pandas(chunk, schema=schema, preserve_index=False))
+    finally:
+        if writer is not None:
+            writer.close()
+
+
+def export_frame(df: pd.DataFrame, fmt: str, target: Optional[str] = None,
+                 sheet_name: str = 'Sheet1') -> str:
+    """
+    Write ``df`` in ``fmt`` (a key of EXPORT_FORMATS) to ``target``, or to a new temp file.
+
+    Returns the path written. Every format is produced in chunks on disk, so
+    the encoded payload is never held in memory next to the frame.
+    """
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Unknown export format {fmt}; expected one of {list(EXPORT_FORMATS)}")
+    if target is None:
+        handle, target = tempfile.mkstemp(prefix='isidora-', suffix=EXPORT_FORMATS[fmt].suffix)
+        os.close(handle)
+    if fmt == 'parquet':
+        write_parquet(df, target)
+    elif fmt == 'xlsx':
+        write_xlsx(df, target, sheet_name=sheet_name)
+    else:
+        write_csv(df, target, compression={'csv.gz': 'gzip', 'csv.zst': 'zstd'}.get(fmt))
+    return target
+
+
+def exported_bytes(df: pd.DataFrame, fmt: str, sheet_name: str = 'Sheet1') -> bytes:
+    """
+    Export through a temp file and return its contents, removing the file; for deferred downloads.
+
+    Only the export is deferred until the download is requested: Streamlit
+    keeps a download's payload in memory, so the whole encoded file is read
+    back as one ``bytes`` object. The frame is never encoded in memory.
+    """
+    path = export_frame(df, fmt, sheet_name=sheet_name)
+    try:
+        with open(path, 'rb') as handle:
+            return handle.read()
+    finally:
+        os.remove(path)
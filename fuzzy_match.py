@@ -0,0 +1,142 @@
+import re
+from collections import defaultdict
+from typing import Dict, Hashable, Iterable, List, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+# Macedonian Cyrillic and Latin diacritics -> plain Latin, so 'Комерцијална' meets 'Komercijalna'
+TRANSLITERATION = str.maketrans({
+    'А': 'A', 'Б': 'B', 'В': 'V', 'Г': 'G', 'Д': 'D', 'Ѓ': 'GJ', 'Е': 'E', 'Ж': 'ZH',
+    'З': 'Z', 'Ѕ': 'DZ', 'И': 'I', 'Ј': 'J', 'К': 'K', 'Л': 'L', 'Љ': 'LJ', 'М': 'M',
+    'Н': 'N', 'Њ': 'NJ', 'О': 'O', 'П': 'P', 'Р': 'R', 'С': 'S', 'Т': 'T', 'Ќ': 'KJ',
+    'У': 'U', 'Ф': 'F', 'Х': 'H', 'Ц': 'C', 'Ч': 'CH', 'Џ': 'DZH', 'Ш': 'SH',
+    'Č': 'CH', 'Ć': 'KJ', 'Š': 'SH', 'Ž': 'ZH', 'Đ': 'GJ', 'Ǵ': 'GJ', 'Ḱ': 'KJ',
+})
+
+# Legal forms dropped from the end of a name before matching (after transliteration and removing dots)
+LEGAL_FORMS = {
+    'AD', 'DOO', 'DOOEL', 'TP', 'JP', 'KD', 'JTD', 'EAD',
+    'AKCIONERSKO DRUSHTVO', 'DRUSHTVO SO OGRANICHENA ODGOVORNOST',
+    'DRUSHTVO SO OGRANICHENA ODGOVORNOST NA EDNO LICE',
+    'JSC', 'LTD', 'LLC', 'PLC', 'SA', 'AG', 'GMBH',
+}
+# Longest first, so a spelled-out form is stripped whole
+_LEGAL_FORM_WORDS = sorted((form.split() for form in LEGAL_FORMS), key=len, reverse=True)
+
+NGRAM = 3
+# Grams occurring in more than this share of names are too common to select candidates
+MAX_GRAM_SHARE = 0.05
+# Candidates kept after the informative grams, before common grams are counted exactly
+SHORTLIST = 200
+
+
+def normalize_name(name) -> str:
+    """Upper-case, transliterate and strip punctuation and trailing legal forms from a company name."""
+    text = str(name).upper().replace('.', '')
+    text = text.translate(TRANSLITERATION)
+    text = re.sub(r'[^A-Z0-9]+', ' ', text)
+    words = text.split()
+    # Only suffixes are legal forms ('AD' inside a name is part of it); at least one word is kept
+    stripped = True
+    while stripped:
+        stripped = False
+        for form in _LEGAL_FORM_WORDS:
+            if len(words) > len(form) and words[-len(form):] == form:
+                del words[-len(form):]
+                stripped = True
+                break
+    return ' '.join(words)
+
+
+def ngrams(text: str, n: int = NGRAM) -> set:
+    padded = f' {text} '
+    return {padded[i:i + n] for i in range(max(len(padded) - n + 1, 1))}
+
+
+class NameIndex:
+    """
+    Character n-gram inverted index over company names.
+
+    Candidates are selected through the query's informative (rare) n-grams
+    only; the common grams are then counted for that shortlist by binary
+    search in their sorted postings. Candidates are ranked by the Dice
+    coefficient of the gram sets, so lookups stay fast on hundreds of
+    thousands of names.
+    """
+
+    def __init__(self, entries: Iterable[Tuple[Hashable, str]], n: int = NGRAM):
+        self.n = n
+        self.keys: List[Hashable] = []
+        self.names: List[str] = []
+        sizes = []
+        postings = defaultdict(list)
+        for key, name in entries:
+            grams = ngrams(normalize_name(name), n)
+            position = len(self.keys)
+            self.keys.append(key)
+            self.names.append(name)
+            sizes.append(len(grams))
+            for gram in grams:
+                postings[gram].append(position)
+
+        self.sizes = np.array(sizes, dtype=np.int32)
+        self.common_limit = max(int(len(self.keys) * MAX_GRAM_SHARE), 50)
+        # Positions are appended in increasing order, so every posting list is sorted
+        self.postings: Dict[str, np.ndarray] = {
+            gram: np.array(ids, dtype=np.int32) for gram, ids in postings.items()
+        }
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def search(self, name, limit: int = 5, min_score: float = 0.3) -> List[Tuple[Hashable, str, float]]:
+        """Best matches for ``name`` as (key, name, score) with score in [0, 1]."""
+        grams = ngrams(normalize_name(name), self.n)
+        known = sorted((gram for gram in grams if gram in self.postings),
+                       key=lambda gram: len(self.postings[gram]))
+        if not known:
+            return []
+        informative = [gram for gram in known if len(self.postings[gram]) <= self.common_limit] or known[:3]
+
+        ids, shared = np.unique(np.concatenate([self.postings[gram] for gram in informative]),
+                                return_counts=True)
+        if len(ids) > SHORTLIST:
+            keep = np.argpartition(-shared, SHORTLIST)[:SHORTLIST]
+            ids, shared = ids[keep], shared[keep]
+        for gram in known[len(informative):]:
+            posting = self.postings[gram]
+            found = np.searchsorted(posting, ids)
+            shared = shared + (posting[np.minimum(found, len(posting) - 1)] == ids)
+
+        scores = 2.0 * shared / (len(grams) + self.sizes[ids])
+        order = np.argsort(-scores)[:limit]
+        return [
+            (self.keys[ids[i]], self.names[ids[i]], round(float(scores[i]), 3))
+            for i in order if scores[i] >= min_score
+        ]
+
+
+def suggest_matches(unmatched: Sequence[str], indexes: Dict[str, NameIndex],
+                    limit: int = 3, min_score: float = 0.3) -> pd.DataFrame:
+    """
+    Ranked candidates for every unmatched reporter name.
+
+    ``indexes`` maps a source label (e.g. 'листа известувачи', 'SQL') to its index.
+    """
+    rows = []
+    for name in unmatched:
+        candidates = []
+        for source, index in indexes.items():
+            candidates.extend((score, key, found, source) for key, found, score in
+                              index.search(name, limit=limit, min_score=min_score))
+        for rank, (score, key, found, source) in enumerate(sorted(candidates, key=lambda c: -c[0])[:limit], 1):
+            rows.append({
+                'Известувач': name,
+                'Ранг': rank,
+                'Кандидат': found,
+                'матичен број': key,
+                'Извор': source,
+                'Сличност': score,
+            })
+    return pd.DataFrame(rows, columns=['Известувач', 'Ранг', 'Кандидат', 'матичен број', 'Извор', 'Сличност'])
@@ -0,0 +1,88 @@
+import hashlib
+from typing import Hashable, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+PAGE_SIZES = [50, 100, 500, 1000]
+
+
+def sort_order(df: pd.DataFrame, sort_by: str, ascending: bool = True) -> np.ndarray:
+    """Row positions of ``df`` sorted by one column, missing values last."""
+    column = df[sort_by].reset_index(drop=True)
+    if isinstance(column.dtype, pd.CategoricalDtype) and not column.cat.ordered:
+        # Unordered categories are kept in first-appearance order: sort them by value, once each
+        try:
+            categories = sorted(column.cat.categories)
+        except TypeError:
+            categories = sorted(column.cat.categories, key=str)
+        column = column.cat.reorder_categories(categories, ordered=True)
+    try:
+        return column.sort_values(ascending=ascending, kind='stable', na_position='last').index.to_numpy()
+    except TypeError:  # mixed types, e.g. numeric and LEI codes: sort by their text
+        return column.astype(str).sort_values(ascending=ascending, kind='stable').index.to_numpy()
+
+
+def column_digest(column: pd.Series) -> str:
+    """Digest of a column's values and index, in order; changes whenever its sort order could."""
+    hashes = pd.util.hash_pandas_object(column, index=True).to_numpy()
+    return hashlib.sha1(hashes.tobytes()).hexdigest()
+
+
+def grid_window(df: pd.DataFrame, page: int, page_size: int,
+                columns: Optional[Sequence[str]] = None,
+                order: Optional[np.ndarray] = None) -> pd.DataFrame:
+    """Rows of one page (1-based) in ``order``, projected to ``columns``; only this window is copied."""
+    start = (page - 1) * page_size
+    positions = order[start:start + page_size] if order is not None else np.arange(start, min(start + page_size, len(df)))
+    window = df.iloc[positions]
+    return window[list(columns)] if columns else window
+
+
+def paginated_grid(df: pd.DataFrame, key: str,
+                   columns: Optional[List[str]] = None,
+                   height: int = 400,
+                   data_key: Optional[Hashable] = None) -> None:
+    """
+    Show ``df`` one page at a time.
+
+    Slicing, sorting and column projection happen on the server and only the
+    visible page is sent to the browser. Page size, page index and sort are
+    kept in session state under ``key``; the sort order is computed once per
+    frame and column. ``data_key`` identifies the frame's content (e.g. a
+    workbook digest and sheet); without it the sort column is hashed.
+    """
+    if df is None or df.empty:
+        st.info("Нема податоци за приказ.")
+        return
+
+    controls = st.columns([3, 1, 1, 1])
+    with controls[0]:
+        sort_by = st.selectbox("Подреди по", ["—"] + [str(col) for col in df.columns], key=f"{key}_sort")
+    with controls[1]:
+        ascending = st.toggle("Растечки", value=True, key=f"{key}_ascending")
+    with controls[2]:
+        page_size = st.selectbox("Редови по страна", PAGE_SIZES, index=1, key=f"{key}_page_size")
+    pages = max((len(df) - 1) // page_size + 1, 1)
+    # Stay within range when the frame or the page size changes
+    if st.session_state.get(f"{key}_page", 1) > pages:
+        st.session_state[f"{key}_page"] = pages
+    with controls[3]:
+        page = st.number_input("Страна", min_value=1, max_value=pages, step=1, key=f"{key}_page")
+
+    order = None
+    if sort_by != "—":
+        sort_column = next(col for col in df.columns if str(col) == sort_by)
+        content = data_key if data_key is not None else column_digest(df[sort_column])
+        signature = (content, len(df), sort_by, ascending)
+        cached = st.session_state.get(f"{key}_order")
+        if cached is None or cached[0] != signature:
+            cached = (signature, sort_order(df, sort_column, ascending))
+            st.session_state[f"{key}_order"] = cached
+        order = cached[1]
+
+    st.dataframe(grid_window(df, int(page), page_size, columns, order),
+                 use_container_width=True, height=height)
+    first = (int(page) - 1) * page_size + 1
+    st.caption(f"Редови {first:,}–{min(first + page_size - 1, len(df)):,} од {len(df):,} (страна {int(page)} од {pages})")
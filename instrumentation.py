@@ -0,0 +1,288 @@
+import json
+import os
+import sys
+import threading
+import time
+import tracemalloc
+import uuid
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import asdict, dataclass, field
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional
+
+import pandas as pd
+from sheet_cache import CACHE_DIR
+
+try:
+    import resource
+except ImportError:  # Windows has no resource module; psutil, if installed, reports peak RSS there
+    resource = None
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+# JSON lines file every finished trace is appended to; an empty value disables the log
+STAGE_LOG_PATH = os.environ.get('ISIDORA_STAGE_LOG', str(CACHE_DIR / 'logs' / 'stages.jsonl'))
+# Tracing Python allocations makes the traced code several times slower, so it is opt-in
+TRACE_ALLOCATIONS = os.environ.get('ISIDORA_TRACE_ALLOCATIONS') == '1'
+# Finished traces kept in memory for the dashboards
+RECENT_TRACES = 50
+
+MB = 1024 * 1024
+
+
+def peak_rss_mb() -> Optional[float]:
+    """High-water mark of the process's resident memory so far, in MB; None if it cannot be read."""
+    if resource is not None:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / MB if sys.platform == 'darwin' else peak / 1024  # bytes on macOS, KB elsewhere
+    if psutil is not None:
+        info = psutil.Process().memory_info()
+        return getattr(info, 'peak_wset', info.rss) / MB
+    return None
+
+
+def count_rows(value) -> Optional[int]:
+    """Rows of a frame or entries of a mapping; None for anything else."""
+    if isinstance(value, (pd.DataFrame, pd.Series, dict)):
+        return len(value)
+    return None
+
+
+@dataclass
+class Step:
+    """
+    One timed step of a trace.
+
+    ``peak_alloc_mb`` is the most Python memory allocated during the step
+    above what was allocated when it started (only with allocation tracing);
+    ``peak_rss_mb`` is the process's peak RSS when the step ended, so the
+    step during which it rises is the one that grew the process.
+    """
+    name: str
+    id: int = 0
+    parent: Optional[int] = None  # id of the step this one ran inside
+    depth: int = 0
+    status: str = 'ok'  # 'ok', 'hit' (memoized result reused) or 'error'
+    seconds: float = 0.0
+    rows_in: Optional[int] = None
+    rows_out: Optional[int] = None
+    peak_alloc_mb: Optional[float] = None
+    peak_rss_mb: Optional[float] = None
+
+
+@dataclass
+class Trace:
+    """The steps of one operation on one source (e.g. processing an uploaded packet), in start order."""
+    operation: str
+    source: Optional[str] = None
+    context: Dict[str, Any] = field(default_factory=dict)
+    id: str = field(default_factory=lambda: uuid.uuid4().hex[:12])
+    started: float = field(default_factory=time.time)
+    seconds: float = 0.0
+    status: str = 'ok'
+    error: Optional[str] = None
+    steps: List[Step] = field(default_factory=list)
+
+    def __post_init__(self):
+        self._trace_allocations = False
+        self._lock = threading.Lock()
+
+    def to_record(self) -> Dict[str, Any]:
+        record = asdict(self)
+        record['started'] = datetime.fromtimestamp(self.started).isoformat(timespec='milliseconds')
+        return record
+
+
+_current: ContextVar[Optional[Trace]] = ContextVar('isidora_trace', default=None)
+# Innermost open step, per context so steps running on other threads nest under the step that started them
+_open_step: ContextVar[Optional[Step]] = ContextVar('isidora_open_step', default=None)
+# [allocated at start, peak so far] of the innermost open step
+_allocations: ContextVar[Optional[List[int]]] = ContextVar('isidora_step_allocations', default=None)
+_recent: deque = deque(maxlen=RECENT_TRACES)
+_log_lock = threading.Lock()
+
+
+def current_trace() -> Optional[Trace]:
+    return _current.get()
+
+
+def annotate(**context) -> None:
+    """Add context (e.g. the workbook digest) to the active trace, if any."""
+    current = _current.get()
+    if current is not None:
+        current.context.update(context)
+
+
+def source_name(source) -> Optional[str]:
+    """A readable name for an upload, path or workbook session."""
+    name = getattr(source, 'name', None)
+    if name:
+        return str(name)
+    if isinstance(source, (str, os.PathLike)):
+        return os.path.basename(os.fspath(source))
+    return None
+
+
+def _start_allocations() -> List[int]:
+    allocated, peak = tracemalloc.get_traced_memory()
+    parent = _allocations.get()
+    if parent is not None:
+        parent[1] = max(parent[1], peak)
+    tracemalloc.reset_peak()
+    return [allocated, allocated]
+
+
+def _stop_allocations(entry: List[int]) -> float:
+    allocated, peak = entry
+    peak = max(peak, tracemalloc.get_traced_memory()[1])
+    parent = _allocations.get()
+    if parent is not None:  # the enclosing step's peak includes this one
+        parent[1] = max(parent[1], peak)
+    return (peak - allocated) / MB
+
+
+@contextmanager
+def step(name: str, rows_in: Optional[int] = None) -> Iterator[Step]:
+    """
+    Time the block as a step of the active trace; set ``rows_out`` on the yielded step.
+
+    The block is always timed. It is recorded, with memory, only inside a trace.
+    tracemalloc is process-wide, so the allocations of steps running at the
+    same time on other threads are included in each other's peaks.
+    """
+    record = Step(name, rows_in=rows_in)
+    current = _current.get()
+    if current is not None:
+        parent = _open_step.get()
+        if parent is not None:
+            record.parent, record.depth = parent.id, parent.depth + 1
+        with current._lock:
+            record.id = len(current.steps)
+            current.steps.append(record)
+        open_token = _open_step.set(record)
+        if current._trace_allocations:
+            entry = _start_allocations()
+            allocations_token = _allocations.set(entry)
+    started = time.perf_counter()
+    try:
+        yield record
+    except BaseException:
+        record.status = 'error'
+        raise
+    finally:
+        record.seconds = time.perf_counter() - started
+        if current is not None:
+            if current._trace_allocations:
+                _allocations.reset(allocations_token)
+                record.peak_alloc_mb = _stop_allocations(entry)
+            record.peak_rss_mb = peak_rss_mb()
+            _open_step.reset(open_token)
+
+
+def write_log(current: Trace, path: Optional[str] = None) -> None:
+    """Append a trace as one JSON line; a log that cannot be written is skipped."""
+    path = STAGE_LOG_PATH if path is None else path
+    if not path:
+        return
+    line = json.dumps(current.to_record(), ensure_ascii=False, default=str) + '\n'
+    try:
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        with _log_lock, open(path, 'a', encoding='utf-8') as handle:
+            handle.write(line)
+    except OSError:
+        pass
+
+
+@contextmanager
+def trace(operation: str, source=None, **context) -> Iterator[Trace]:
+    """
+    Record the steps run inside the block as one trace of ``operation`` on ``source``.
+
+    When the block ends the trace is appended to the JSON log and kept in
+    recent_traces(). Inside another trace the block's steps join that trace
+    instead. Allocations are traced with tracemalloc when
+    ISIDORA_TRACE_ALLOCATIONS=1.
+    """
+    outer = _current.get()
+    if outer is not None:
+        outer.context.update(context)
+        yield outer
+        return
+
+    current = Trace(operation, source_name(source) if source is not None else None, context)
+    token = _current.set(current)
+    # Only when this trace owns tracemalloc: resetting its peak would disturb another user of it
+    own_tracing = current._trace_allocations = TRACE_ALLOCATIONS and not tracemalloc.is_tracing()
+    if own_tracing:
+        tracemalloc.start()
+    started = time.perf_counter()
+    try:
+        yield current
+    except BaseException as e:
+        current.status, current.error = 'error', str(e)
+        raise
+    finally:
+        current.seconds = time.perf_counter() - started
+        if own_tracing:
+            tracemalloc.stop()
+        _current.reset(token)
+        _recent.append(current)
+        write_log(current)
+
+
+def recent_traces() -> List[Trace]:
+    """Traces finished in this process, newest first."""
+    return list(reversed(_recent))
+
+
+def tree_order(steps: List[Step]) -> List[Step]:
+    """Steps with every step followed by the steps it ran, even when those ran on other threads."""
+    children: Dict[Optional[int], List[Step]] = {}
+    for s in steps:
+        children.setdefault(s.parent, []).append(s)
+    ordered = []
+
+    def visit(parent: Optional[int]) -> None:
+        for s in children.get(parent, []):
+            ordered.append(s)
+            visit(s.id)
+
+    visit(None)
+    return ordered
+
+
+def steps_frame(steps: List[Step]) -> pd.DataFrame:
+    """Steps as a table for the dashboards, nested steps indented under the step they ran in."""
+    steps = tree_order(steps)
+    status_labels = {'ok': '🔄 пресметано', 'hit': '✅ од кеш', 'error': '❌ грешка'}
+    return pd.DataFrame({
+        'Фаза': ['  ' * s.depth + ('└ ' if s.depth else '') + s.name for s in steps],
+        'Статус': [status_labels.get(s.status, s.status) for s in steps],
+        'Време (s)': [round(s.seconds, 3) for s in steps],
+        'Редови влез': pd.array([s.rows_in for s in steps], dtype='Int64'),
+        'Редови излез': pd.array([s.rows_out for s in steps], dtype='Int64'),
+        'Алокации (MB)': [None if s.peak_alloc_mb is None else round(s.peak_alloc_mb, 1) for s in steps],
+        'Врв RSS (MB)': [None if s.peak_rss_mb is None else round(s.peak_rss_mb, 1) for s in steps],
+    })
+
+
+def traces_frame(traces: List[Trace]) -> pd.DataFrame:
+    """One row per trace with its slowest step, to find which file and stage were slow."""
+    def slowest(current: Trace) -> str:
+        leaves = [s for s in current.steps if s.status != 'hit']
+        worst = max(leaves, key=lambda s: s.seconds, default=None)
+        return f'{worst.name} ({worst.seconds:.2f}s)' if worst else ''
+
+    return pd.DataFrame({
+        'Почеток': [datetime.fromtimestamp(t.started).strftime('%H:%M:%S') for t in traces],
+        'Операција': [t.operation for t in traces],
+        'Извор': [t.source or '' for t in traces],
+        'Време (s)': [round(t.seconds, 3) for t in traces],
+        'Најбавна фаза': [slowest(t) for t in traces],
+        'Статус': [t.status for t in traces],
+    })
@@ -0,0 +1,176 @@
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Hashable, List, Optional, Set
+
+from instrumentation import Step, source_name, trace
+
+# Packets processed at the same time; the rest wait in the queue
+JOB_WORKERS = int(os.environ.get('ISIDORA_JOB_WORKERS', '2'))
+# Finished jobs kept, with their results, for sessions that poll them later
+MAX_FINISHED_JOBS = 8
+
+QUEUED, RUNNING, DONE, FAILED, CANCELLED = 'queued', 'running', 'done', 'failed', 'cancelled'
+
+
+class JobCancelled(Exception):
+    """Raised inside a job at its next progress report after cancellation was requested."""
+
+
+@dataclass
+class Job:
+    """
+    One submitted piece of work and its state, as polled by the UI.
+
+    The job function receives ``progress`` (this job's ``report``); calling it
+    is also where a cancelled job stops, so cancellation takes effect at the
+    next stage or chunk boundary. Sessions polling the job are its watchers;
+    it is cancelled only when the last of them cancels.
+    """
+    key: Hashable
+    label: str
+    source: Optional[str] = None
+    id: str = field(default_factory=lambda: uuid.uuid4().hex[:12])
+    status: str = QUEUED
+    progress: float = 0.0
+    message: str = ''
+    submitted: float = field(default_factory=time.time)
+    started: Optional[float] = None
+    finished: Optional[float] = None
+    error: Optional[str] = None
+    steps: List[Step] = field(default_factory=list)
+
+    def __post_init__(self):
+        self._result = None
+        self._cancel = threading.Event()
+        self._future: Optional[Future] = None
+        self._watchers: Set[Hashable] = set()
+        self._watch_lock = threading.Lock()
+
+    @property
+    def done(self) -> bool:
+        return self.status in (DONE, FAILED, CANCELLED)
+
+    def report(self, fraction: Optional[float] = None, message: Optional[str] = None) -> None:
+        """Update progress (``fraction`` in 0..1, None to keep it); raises JobCancelled if cancelled."""
+        if self._cancel.is_set():
+            raise JobCancelled(self.id)
+        if fraction is not None:
+            self.progress = min(max(float(fraction), 0.0), 1.0)
+        if message is not None:
+            self.message = message
+
+    def watch(self, watcher: Optional[Hashable]) -> None:
+        """Register a session polling this job."""
+        if watcher is not None:
+            with self._watch_lock:
+                self._watchers.add(watcher)
+
+    def cancel(self, watcher: Optional[Hashable] = None) -> bool:
+        """
+        Cancel a queued job now, or a running one at its next progress report.
+
+        With ``watcher``, that session stops watching, and the job is cancelled
+        only if no other session still watches it. Returns whether it was cancelled.
+        """
+        with self._watch_lock:
+            self._watchers.discard(watcher)
+            if watcher is not None and self._watchers:
+                return False
+            self._cancel.set()
+        if self._future is not None and self._future.cancel():
+            self.status, self.finished = CANCELLED, time.time()
+        return True
+
+    def result(self):
+        """The job's result once it is done; None before, or if it failed or was cancelled."""
+        return self._result if self.status == DONE else None
+
+
+class JobRunner:
+    """
+    A thread pool with a job table.
+
+    Jobs are keyed by what they compute (e.g. workbook digest and options), so
+    submitting a key that is queued, running or done returns the existing job:
+    reruns and other sessions uploading the same packet poll one job instead of
+    redoing the work. Threads share the process's memoized stages and parsed
+    workbooks; failed and cancelled jobs are run again on the next submit.
+    """
+
+    def __init__(self, max_workers: int = JOB_WORKERS, keep: int = MAX_FINISHED_JOBS):
+        self.keep = keep
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='isidora-job')
+        self._jobs: 'OrderedDict[str, Job]' = OrderedDict()
+        self._by_key: Dict[Hashable, str] = {}
+        self._lock = threading.Lock()
+
+    def submit(self, key: Hashable, func: Callable, *args, label: str = 'job', source=None,
+               watcher: Optional[Hashable] = None, **kwargs) -> Job:
+        """
+        Run ``func(*args, progress=..., **kwargs)`` as a job, unless ``key`` already has a live one.
+
+        ``watcher`` (e.g. a session id) is added to the watchers of the returned job.
+        """
+        with self._lock:
+            existing = self._jobs.get(self._by_key.get(key))
+            if existing is not None and existing.status not in (FAILED, CANCELLED) \
+                    and not existing._cancel.is_set():
+                existing.watch(watcher)
+                return existing
+            job = Job(key, label, source=source_name(source) if source is not None else None)
+            job.watch(watcher)
+            self._jobs[job.id] = job
+            self._by_key[key] = job.id
+            job._future = self._pool.submit(self._run, job, func, args, kwargs, source)
+            self._prune()
+        return job
+
+    def _run(self, job: Job, func: Callable, args, kwargs, source) -> None:
+        job.status, job.started = RUNNING, time.time()
+        try:
+            with trace(job.label, source=source, job=job.id) as current:
+                try:
+                    job.report()  # cancelled while queued
+                    job._result = func(*args, progress=job.report, **kwargs)
+                finally:
+                    job.steps = current.steps
+            job.status, job.progress = DONE, 1.0
+        except JobCancelled:
+            job.status = CANCELLED
+        except Exception as e:
+            job.status, job.error = FAILED, str(e)
+        finally:
+            job.finished = time.time()
+
+    def _prune(self) -> None:
+        finished = [job for job in self._jobs.values() if job.done]
+        for job in finished[:max(len(finished) - self.keep, 0)]:
+            del self._jobs[job.id]
+            if self._by_key.get(job.key) == job.id:
+                del self._by_key[job.key]
+
+    def get(self, job_id: Optional[str]) -> Optional[Job]:
+        return self._jobs.get(job_id)
+
+    def jobs(self) -> List[Job]:
+        """Every job in the table, newest first."""
+        with self._lock:
+            return list(reversed(self._jobs.values()))
+
+
+_default_runner: Optional[JobRunner] = None
+_default_runner_lock = threading.Lock()
+
+
+def default_runner() -> JobRunner:
+    """Process-wide job runner, shared by every Streamlit session."""
+    global _default_runner
+    with _default_runner_lock:
+        if _default_runner is None:
+            _default_runner = JobRunner()
+    return _default_runner
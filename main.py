@@ -1,8 +1,8 @@
-import pandas as pd
+from workbook import open_workbook
 
 def load_excel(file_path):
     # Load all sheets as a dictionary
-    xls = pd.read_excel(file_path, sheet_name=None)
+    xls = open_workbook(file_path).sheets()
     return xls
 
 def show_sheet_summary(data):
@@ -0,0 +1,67 @@
+from typing import Callable, Dict, Optional
+
+import numpy as np
+import pandas as pd
+
+# Transforms applied to the distinct values of a column; non-strings are left as they are
+TRANSFORMS: Dict[str, Callable] = {
+    'strip': lambda value: value.strip() if isinstance(value, str) else value,
+    'upper': lambda value: value.strip().upper() if isinstance(value, str) else value,
+}
+
+# Low-cardinality ISIDORA columns, stored as categoricals, and their transform
+CATEGORICAL_COLUMNS = {
+    'Известувач': 'upper',
+    'Вид на износ': 'upper',
+    'Пакет': 'strip',
+    'Позиција': 'strip',
+    'Котација': 'strip',
+    'Тип на договорна страна': 'strip',
+    'Земја': 'strip',
+    'Сектор': 'strip',
+}
+
+
+def to_categorical(series: pd.Series, transform: str = 'strip') -> pd.Series:
+    """
+    Convert a column to a categorical, transforming each distinct value once.
+
+    Values that become equal after the transform (e.g. 'drvr ' and 'DRVR')
+    share one category. Missing values stay missing.
+    """
+    func = TRANSFORMS[transform]
+    codes, uniques = pd.factorize(series)
+    new_codes, categories = pd.factorize(np.array([func(value) for value in uniques], dtype=object))
+    codes = np.where(codes >= 0, new_codes[np.maximum(codes, 0)], -1) if len(new_codes) else codes
+    return pd.Series(pd.Categorical.from_codes(codes, categories=categories),
+                     index=series.index, name=series.name)
+
+
+def normalize_categoricals(df: pd.DataFrame,
+                           columns: Optional[Dict[str, str]] = None) -> pd.DataFrame:
+    """
+    Convert the low-cardinality columns present in ``df`` to normalized categoricals.
+
+    Columns that are already categorical were normalized when the sheet was
+    parsed (see schema.apply_schema) and are left as they are.
+    """
+    for col, transform in (columns or CATEGORICAL_COLUMNS).items():
+        if col in df.columns and not isinstance(df[col].dtype, pd.CategoricalDtype):
+            df[col] = to_categorical(df[col], transform)
+    return df
+
+
+def map_values(series: pd.Series, mapping: Dict) -> pd.Series:
+    """
+    ``series.map(mapping)`` evaluated once per distinct value.
+
+    Unlike mapping a categorical directly, the result is a plain column with
+    the dtype the mapped values call for (e.g. float for матичен број with gaps).
+    """
+    codes, uniques = pd.factorize(series)
+    mapped = pd.Series(np.asarray(uniques, dtype=object)).map(mapping)
+    if (codes < 0).any():
+        mapped = pd.concat([mapped, pd.Series([np.nan])], ignore_index=True)
+    else:
+        mapped = mapped.infer_objects()
+    return pd.Series(mapped.to_numpy()[codes], index=series.index, name=series.name)
@@ -0,0 +1,94 @@
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+from rules import apply_rules
+
+
+@dataclass
+class Aggregation:
+    """Totals of a packet: ``values`` ({column: pandas aggregation}) per group of ``by``."""
+    by: Sequence[str]
+    values: Dict[str, str]
+
+    def apply(self, df: pd.DataFrame) -> pd.DataFrame:
+        return df.groupby(list(self.by), observed=True, dropna=False).agg(self.values).reset_index()
+
+
+@dataclass
+class PacketProcessor:
+    """
+    How one output packet is built from the mapped 'Примени податоци' rows.
+
+    ``packets`` are the values of 'Пакет' whose rows it takes. Its ``rules``
+    (see rules.py) add the derived columns after the date columns, and an
+    optional ``aggregation`` summarizes the result.
+    """
+    name: str
+    packets: Sequence[str]
+    rules: Sequence = field(default_factory=list)
+    aggregation: Optional[Aggregation] = None
+
+    def build(self, df: pd.DataFrame, lookups: Dict[str, Dict]) -> pd.DataFrame:
+        """Add the date columns and the packet's rule columns to its rows."""
+        df = df.copy(deep=False)
+        # Dates are typed as datetimes by the sheet schema
+        df['Датум'] = df['Извештаен датум'].dt.date
+        df['Година'] = df['Извештаен датум'].dt.year
+        # Derived columns, evaluated once per distinct value
+        return apply_rules(df, self.rules, lookups=lookups)
+
+    def summarize(self, df: pd.DataFrame) -> Optional[pd.DataFrame]:
+        return self.aggregation.apply(df) if self.aggregation is not None else None
+
+
+@dataclass
+class PacketResult:
+    """A processed packet: its rows and, if it has an aggregation, their totals."""
+    rows: pd.DataFrame
+    summary: Optional[pd.DataFrame] = None
+
+
+# Registered packet processors by name, in registration (and output) order
+PACKET_PROCESSORS: Dict[str, PacketProcessor] = {}
+
+
+def register(processor: PacketProcessor) -> PacketProcessor:
+    """Add a processor to the registry; every 'Пакет' value may belong to one processor only."""
+    for other in PACKET_PROCESSORS.values():
+        if other.name == processor.name:
+            continue
+        shared = set(other.packets) & set(processor.packets)
+        if shared:
+            raise ValueError(f"Packets {sorted(shared)} already belong to '{other.name}'")
+    PACKET_PROCESSORS[processor.name] = processor
+    return processor
+
+
+def registered_packets(processors: Optional[Sequence[PacketProcessor]] = None) -> List[str]:
+    """Every 'Пакет' value taken by the processors (default: all registered ones)."""
+    processors = list(PACKET_PROCESSORS.values()) if processors is None else processors
+    return [packet for processor in processors for packet in processor.packets]
+
+
+def split_packets(df: pd.DataFrame, processors: Sequence[PacketProcessor]) -> Dict[str, pd.DataFrame]:
+    """
+    The rows of every processor's packets, from one groupby on 'Пакет'.
+
+    Rows keep their order in the sheet; a processor whose packets are absent
+    gets an empty frame with the same columns. Values of 'Пакет' no processor
+    takes are dropped.
+    """
+    if 'Пакет' not in df.columns:
+        # A sheet without packets is taken whole by every processor
+        return {processor.name: df for processor in processors}
+    owner = {packet: processor.name for processor in processors for packet in processor.packets}
+    positions: Dict[str, List[np.ndarray]] = {processor.name: [] for processor in processors}
+    for packet, rows in df.groupby('Пакет', observed=True, sort=False).indices.items():
+        if packet in owner:
+            positions[owner[packet]].append(rows)
+    return {
+        name: df.iloc[np.sort(np.concatenate(parts))] if parts else df.iloc[:0]
+        for name, parts in positions.items()
+    }
@@ -0,0 +1,190 @@
+import contextvars
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import FIRST_COMPLETED, Executor, Future, wait
+from dataclasses import dataclass, fields, is_dataclass
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import pandas as pd
+from instrumentation import count_rows, step
+
+# Memoized stage results kept per process, by approximate in-memory size
+MAX_MEMO_BYTES = int(os.environ.get('ISIDORA_STAGE_MEMO_MB', '1024')) * 1024 * 1024
+
+
+@dataclass
+class Stage:
+    """
+    A named step of a pipeline.
+
+    ``func`` is called with the results of ``inputs`` (stage or external input
+    names), in order. ``params`` is part of the stage key, so changing it
+    (e.g. the rule list) invalidates the stage and everything downstream.
+    """
+    name: str
+    func: Callable
+    inputs: Sequence[str] = ()
+    params: Any = None
+
+
+@dataclass
+class StageRun:
+    name: str
+    status: str  # 'hit', 'miss' or 'skipped' (not needed for the target)
+    seconds: float = 0.0
+
+
+def _size(value) -> int:
+    """Approximate bytes of a stage result, including the frames inside dicts and dataclasses."""
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(index=True).sum())
+    if isinstance(value, dict):
+        return sum(64 + _size(item) for item in value.values())
+    if is_dataclass(value) and not isinstance(value, type):
+        return sum(_size(getattr(value, f.name)) for f in fields(value))
+    return 0
+
+
+class StageMemo:
+    """Thread-safe LRU of stage results keyed by stage key, bounded by approximate size."""
+
+    def __init__(self, max_bytes: int = MAX_MEMO_BYTES):
+        self.max_bytes = max_bytes
+        self._entries: 'OrderedDict[str, Tuple[Any, int]]' = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Tuple[bool, Any]:
+        with self._lock:
+            if key not in self._entries:
+                return False, None
+            self._entries.move_to_end(key)
+            return True, self._entries[key][0]
+
+    def put(self, key: str, value) -> None:
+        size = _size(value)
+        with self._lock:
+            if key in self._entries:
+                self._bytes -= self._entries.pop(key)[1]
+            self._entries[key] = (value, size)
+            self._bytes += size
+            while self._bytes > self.max_bytes and len(self._entries) > 1:
+                self._bytes -= self._entries.popitem(last=False)[1][1]
+
+
+class StageGraph:
+    """
+    A pipeline of stages, compiled once into dependency order.
+
+    Every stage has a key hashed from its name, its params and the keys of its
+    inputs; external inputs are keyed by the caller (e.g. the workbook
+    digest). Keys are known before anything runs, so a rerun looks the
+    target up first and only descends into (and recomputes) the stages whose
+    keys changed.
+    """
+
+    def __init__(self, stages: Sequence[Stage]):
+        self.stages: Dict[str, Stage] = {}
+        self.external: List[str] = []
+        for stage in stages:
+            if stage.name in self.stages:
+                raise ValueError(f"Duplicate stage: {stage.name}")
+            for name in stage.inputs:
+                if name not in self.stages and name not in self.external:
+                    self.external.append(name)  # inputs not produced by an earlier stage
+            self.stages[stage.name] = stage
+        unknown = set(self.external) & set(self.stages)
+        if unknown:
+            raise ValueError(f"Stages used before they are defined: {sorted(unknown)}")
+
+    def keys(self, input_keys: Dict[str, str]) -> Dict[str, str]:
+        """Key of every external input and stage."""
+        missing = [name for name in self.external if name not in input_keys]
+        if missing:
+            raise ValueError(f"Missing pipeline inputs: {missing}")
+        keys = {name: str(input_keys[name]) for name in self.external}
+        for stage in self.stages.values():
+            digest = hashlib.sha256(f'{stage.name}|{stage.params!r}'.encode())
+            for name in stage.inputs:
+                digest.update(keys[name].encode())
+            keys[stage.name] = digest.hexdigest()
+        return keys
+
+    def run(self, target: str, inputs: Dict[str, Any], input_keys: Dict[str, str],
+            memo: Optional[StageMemo] = None,
+            on_stage: Optional[Callable[[str, int, int], None]] = None,
+            executor: Optional[Executor] = None) -> Tuple[Any, List[StageRun]]:
+        """
+        Compute ``target``, reusing memoized stage results; returns (result, stage runs).
+
+        Every stage evaluated is also a step of the active instrumentation trace.
+        ``on_stage`` is called with (stage name, stages done, stages in the graph)
+        before a stage is computed; an exception it raises stops the run.
+        With an ``executor``, every stage whose inputs are ready is submitted at
+        once, so independent stages (e.g. sheet parsing and reference-data
+        queries) overlap and results are joined only where a stage needs them.
+        Without one, stages run one after another in dependency order. Ready
+        stages are started in the order they are defined.
+        """
+        keys = self.keys(input_keys)
+        runs: Dict[str, StageRun] = {}
+        results: Dict[str, Any] = dict(inputs)
+
+        # Stages to compute: the target and, below every stage that is not memoized, its inputs
+        pending: Dict[str, Stage] = {}
+
+        def resolve(name: str) -> None:
+            if name in results or name in pending:
+                return
+            if memo is not None:
+                hit, value = memo.get(keys[name])
+                if hit:
+                    with step(name) as record:
+                        record.status, record.rows_out = 'hit', count_rows(value)
+                    runs[name] = StageRun(name, 'hit')
+                    results[name] = value
+                    return
+            pending[name] = self.stages[name]
+            for dependency in pending[name].inputs:
+                resolve(dependency)
+
+        def compute(stage: Stage, args: List[Any]) -> Tuple[Any, float]:
+            frames = [count_rows(arg) for arg in args if isinstance(arg, pd.DataFrame)]
+            with step(stage.name, rows_in=sum(frames) if frames else None) as record:
+                value = stage.func(*args)
+                record.rows_out = count_rows(value)
+            if memo is not None:
+                memo.put(keys[stage.name], value)
+            return value, record.seconds
+
+        def finish(name: str, value, seconds: float) -> None:
+            runs[name] = StageRun(name, 'miss', seconds)
+            results[name] = value
+
+        resolve(target)
+        running: Dict[Future, str] = {}
+        try:
+            while pending or running:
+                # Started in the order the stages are defined
+                ready = [name for name in self.stages if name in pending
+                         and all(dependency in results for dependency in pending[name].inputs)]
+                for name in ready:
+                    stage = pending.pop(name)
+                    if on_stage is not None:
+                        on_stage(name, len(runs), len(self.stages))
+                    args = [results[dependency] for dependency in stage.inputs]
+                    if executor is None:
+                        finish(name, *compute(stage, args))
+                    else:
+                        # Each stage runs in a copy of this context, so its steps join the active trace
+                        running[executor.submit(contextvars.copy_context().run, compute, stage, args)] = name
+                if running:
+                    done, _ = wait(running, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        finish(running.pop(future), *future.result())
+        finally:
+            for future in running:
+                future.cancel()
+        return results[target], [runs.get(name, StageRun(name, 'skipped')) for name in self.stages]
@@ -0,0 +1,177 @@
+import sqlite3
+import time
+from contextlib import closing
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+from sheet_cache import CACHE_DIR
+from stock_flow import CLOSING, compute_stock_flow
+
+POSITIONS_PATH = CACHE_DIR / 'positions.sqlite'
+
+# Layout of the tables (PRAGMA user_version); positions of an older layout are re-materialized
+SCHEMA_VERSION = 2
+KEYS = ['reporter', 'security']
+
+
+def period_of(df: pd.DataFrame, date_column: str = 'Извештаен датум') -> str:
+    """Reporting period of a workbook as 'YYYY-MM', from its latest reporting date."""
+    dates = pd.to_datetime(df[date_column], errors='coerce')
+    if dates.isna().all():
+        raise ValueError(f"No valid dates in '{date_column}'")
+    return dates.max().strftime('%Y-%m')
+
+
+class PositionStore:
+    """
+    Closing positions per period, reporter and security, persisted in SQLite.
+
+    Ingesting a period stores the principal stock its workbook reported (one
+    row per position, from compute_stock_flow): the position at its reporting
+    date, which is the period's closing stock. The period's opening is
+    materialized from the stored closing positions of the previous period, so
+    history is never re-parsed: a corrected file for one period replaces only
+    that period's reported rows, and only the periods after it whose opening
+    changed are materialized again.
+
+    The first stored period has no closing before it, so its opening is
+    unknown (NULL).
+    """
+
+    def __init__(self, path=POSITIONS_PATH):
+        self.path = str(path)
+        Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+        with closing(self._connect()) as conn:
+            conn.execute('PRAGMA journal_mode=WAL')
+            stale = conn.execute('PRAGMA user_version').fetchone()[0] < SCHEMA_VERSION
+            if stale:
+                # Positions are derived from the reported stock alone: rebuilt below
+                conn.execute('DROP TABLE IF EXISTS positions')
+            conn.execute('CREATE TABLE IF NOT EXISTS periods '
+                         '(period TEXT PRIMARY KEY, digest TEXT, ingested_at REAL)')
+            conn.execute('CREATE TABLE IF NOT EXISTS reported '
+                         '(period TEXT, reporter TEXT, security TEXT, stock REAL, '
+                         'PRIMARY KEY (period, reporter, security))')
+            conn.execute('CREATE TABLE IF NOT EXISTS positions '
+                         '(period TEXT, reporter TEXT, security TEXT, opening REAL, closing REAL, '
+                         'PRIMARY KEY (period, reporter, security))')
+            conn.execute(f'PRAGMA user_version = {SCHEMA_VERSION}')
+            conn.commit()
+        periods = self.periods()
+        if stale and periods:
+            self._materialize_from(periods[0])
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+
+    def periods(self) -> List[str]:
+        with closing(self._connect()) as conn:
+            return [row[0] for row in conn.execute('SELECT period FROM periods ORDER BY period')]
+
+    def digest(self, period: str) -> Optional[str]:
+        with closing(self._connect()) as conn:
+            row = conn.execute('SELECT digest FROM periods WHERE period = ?', (period,)).fetchone()
+        return row[0] if row else None
+
+    def _read(self, table: str, period: str) -> pd.DataFrame:
+        with closing(self._connect()) as conn:
+            return pd.read_sql_query(f'SELECT * FROM {table} WHERE period = ?', conn,
+                                     params=(period,)).drop(columns='period')
+
+    def ingest(self, period: str, df: pd.DataFrame, digest: Optional[str] = None) -> pd.DataFrame:
+        """Store one period's workbook rows and return its materialized closing positions."""
+        if digest is not None and digest == self.digest(period):
+            return self.closing_positions(period)
+        # Only the stock is stored, so no flow codes are needed
+        return self.ingest_result(period, compute_stock_flow(df, {}), digest)
+
+    def ingest_result(self, period: str, result: Dict, digest: Optional[str] = None) -> pd.DataFrame:
+        """Like ingest, for a compute_stock_flow result that is already at hand."""
+        positions = result['positions']
+        reported = pd.DataFrame({label: positions[col] if col else '' for label, col in result['keys'].items()},
+                                index=positions.index)
+        reported['stock'] = positions[CLOSING].to_numpy()
+        reported = reported.groupby(KEYS, as_index=False).sum(min_count=1)
+
+        with closing(self._connect()) as conn:
+            with conn:
+                conn.execute('DELETE FROM reported WHERE period = ?', (period,))
+                conn.executemany(
+                    f'INSERT INTO reported (period, {", ".join(reported.columns)}) '
+                    f'VALUES (?, {", ".join("?" * len(reported.columns))})',
+                    [(period, *row) for row in reported.astype(object).where(reported.notna(), None)
+                     .itertuples(index=False)]
+                )
+                conn.execute('INSERT OR REPLACE INTO periods (period, digest, ingested_at) VALUES (?, ?, ?)',
+                             (period, digest, time.time()))
+        self._materialize_from(period)
+        return self.closing_positions(period)
+
+    def _materialize(self, reported: pd.DataFrame, prior: Optional[pd.DataFrame]) -> pd.DataFrame:
+        if prior is None:
+            # First stored period: no closing before it
+            merged = reported.assign(opening=np.nan)
+        else:
+            merged = reported.merge(prior[KEYS + ['closing']].rename(columns={'closing': 'opening'}),
+                                    on=KEYS, how='outer')
+            merged['opening'] = merged['opening'].fillna(0.0)
+            # A position missing from the file was closed; one closed before is dropped
+            merged = merged[merged['stock'].notna() | (merged['opening'] != 0)]
+        merged['closing'] = merged['stock'].fillna(0.0)
+        return merged[KEYS + ['opening', 'closing']]
+
+    def _materialize_from(self, period: str) -> None:
+        """Materialize ``period`` and the later periods, stopping once closings no longer change."""
+        periods = self.periods()
+        start = periods.index(period)
+        prior = self.closing_positions(periods[start - 1]) if start > 0 else None
+        for current in periods[start:]:
+            previous = self.closing_positions(current)
+            positions = self._materialize(self._read('reported', current), prior)
+            with closing(self._connect()) as conn:
+                with conn:
+                    conn.execute('DELETE FROM positions WHERE period = ?', (current,))
+                    conn.executemany(
+                        'INSERT INTO positions (period, reporter, security, opening, closing) '
+                        'VALUES (?, ?, ?, ?, ?)',
+                        [(current, *row) for row in positions.astype(object).where(positions.notna(), None)
+                         .itertuples(index=False)]
+                    )
+            if current != period and _same_closing(previous, positions):
+                break
+            prior = positions
+
+    def closing_positions(self, period: str) -> pd.DataFrame:
+        """Materialized positions of a period: reporter, security, opening, closing."""
+        return self._read('positions', period)
+
+    def previous_period(self, period: str) -> Optional[str]:
+        """The latest stored period before ``period``, or None."""
+        earlier = [p for p in self.periods() if p < period]
+        return earlier[-1] if earlier else None
+
+    def opening_positions(self, period: str) -> Optional[pd.DataFrame]:
+        """The closing positions of the latest stored period before ``period``, or None."""
+        previous = self.previous_period(period)
+        return self.closing_positions(previous) if previous else None
+
+
+def _same_closing(left: pd.DataFrame, right: pd.DataFrame) -> bool:
+    if len(left) != len(right):
+        return False
+    merged = left.merge(right, on=KEYS, how='outer', suffixes=('_left', '_right'), indicator=True)
+    return bool((merged['_merge'] == 'both').all()
+                and np.allclose(merged['closing_left'], merged['closing_right']))
+
+
+_default_store: Optional[PositionStore] = None
+
+
+def default_position_store() -> PositionStore:
+    """Process-wide position store under the ISIDORA cache directory."""
+    global _default_store
+    if _default_store is None:
+        _default_store = PositionStore()
+    return _default_store
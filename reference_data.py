@@ -0,0 +1,299 @@
+import os
+from abc import ABC, abstractmethod
+import sqlite3
+import threading
+import time
+from contextlib import closing
+from typing import Dict, Iterable, Optional
+
+import pandas as pd
+from instrumentation import step
+from sheet_cache import CACHE_DIR
+
+try:
+    import pyodbc
+except ImportError:  # offline runs and tests use the SQLite backend
+    pyodbc = None
+
+SQL_SERVER_CONNECTION = (
+    r'DRIVER={ODBC Driver 17 for SQL Server};'
+    'SERVER=isql2012;DATABASE=Sifri;Trusted_Connection=yes;'
+)
+
+# Reference tables: name -> (key column, value column)
+REFERENCE_COLUMNS = {
+    'company_names': ('Matbr_stat', 'Poln_naziv_DO'),
+    'sectors': ('Matbr', 'Sektor'),
+}
+
+# Keys per IN (...) batch; SQL Server allows at most 2100 parameters per statement
+LOOKUP_BATCH_SIZE = 1000
+
+SNAPSHOT_PATH = CACHE_DIR / 'reference.sqlite'
+SNAPSHOT_TTL = float(os.environ.get('ISIDORA_REFERENCE_TTL_HOURS', '24')) * 3600
+
+
+def normalize_keys(keys: pd.Series) -> pd.Series:
+    """матичен број as integer, the same way the mappings have always keyed it."""
+    return pd.to_numeric(keys, errors='coerce').fillna(0).astype(int)
+
+
+class ReferenceBackend(ABC):
+    """
+    A database the reference tables are read from.
+
+    Full-table reads open their own connection; keyed lookups share one pooled
+    connection per backend, so a packet's lookups cost a single login.
+    """
+
+    # Reference table name -> fully qualified source table
+    tables: Dict[str, str] = {}
+    # SQL expression turning the stored key column into an integer матичен број
+    key_expression = 'CAST([{key}] AS INTEGER)'
+
+    def __init__(self):
+        self._pooled = None
+        self._pool_lock = threading.Lock()
+
+    @abstractmethod
+    def connect(self):
+        """Open a DB-API connection to the database."""
+
+    def fetch_table(self, name: str) -> pd.DataFrame:
+        """Read the whole key/value table for a reference table."""
+        key, value = REFERENCE_COLUMNS[name]
+        with step(f'SQL {self.tables[name]}') as record, closing(self.connect()) as conn:
+            df = pd.read_sql(f'SELECT [{key}], [{value}] FROM {self.tables[name]}', conn)
+            record.rows_out = len(df)
+        return df
+
+    def fetch_keys(self, name: str, keys: Iterable[int],
+                   batch_size: int = LOOKUP_BATCH_SIZE) -> pd.DataFrame:
+        """Read only the rows of a reference table whose key is in ``keys``."""
+        key, value = REFERENCE_COLUMNS[name]
+        keys = sorted({int(k) for k in keys})
+        where = self.key_expression.format(key=key)
+        rows = []
+        with step(f'SQL {self.tables[name]} by key', rows_in=len(keys)) as record, self._pool_lock:
+            if self._pooled is None:
+                self._pooled = self.connect()
+            try:
+                cursor = self._pooled.cursor()
+                for start in range(0, len(keys), batch_size):
+                    batch = keys[start:start + batch_size]
+                    placeholders = ', '.join('?' * len(batch))
+                    cursor.execute(f'SELECT [{key}], [{value}] FROM {self.tables[name]} '
+                                   f'WHERE {where} IN ({placeholders})', batch)
+                    rows.extend(tuple(row) for row in cursor.fetchall())
+            except Exception:
+                # Drop a broken connection so the next lookup reconnects
+                self._pooled.close()
+                self._pooled = None
+                raise
+            record.rows_out = len(rows)
+        return pd.DataFrame.from_records(rows, columns=[key, value])
+
+
+class SqlServerBackend(ReferenceBackend):
+    """The production Sifri database."""
+
+    tables = {
+        'company_names': '[dbo].[vwDanocni_num]',
+        'sectors': '[dbo].[TblSektor]',
+    }
+
+    key_expression = 'TRY_CAST([{key}] AS BIGINT)'
+
+    def __init__(self, connection_string: str = SQL_SERVER_CONNECTION):
+        super().__init__()
+        self.connection_string = connection_string
+
+    def connect(self):
+        if pyodbc is None:
+            raise ImportError("pyodbc is required for the SQL Server reference backend")
+        return pyodbc.connect(self.connection_string)
+
+
+class SqliteBackend(ReferenceBackend):
+    """A SQLite file with vwDanocni_num and TblSektor, standing in for SQL Server."""
+
+    tables = {
+        'company_names': '[vwDanocni_num]',
+        'sectors': '[TblSektor]',
+    }
+
+    def __init__(self, path: str):
+        super().__init__()
+        self.path = str(path)
+
+    def connect(self):
+        return sqlite3.connect(self.path, check_same_thread=False)
+
+
+class ReferenceStore:
+    """
+    Local SQLite snapshot of the reference tables with a TTL.
+
+    The first request for a whole table takes a full snapshot from the
+    backend. After that mappings are served from the local file; once a
+    snapshot is older than ``ttl`` seconds it is refreshed on a background
+    thread while the old snapshot keeps being served.
+
+    ``lookup`` never waits on a full scan: while no snapshot exists it fetches
+    just the requested keys, keeps them locally, and starts the full snapshot
+    in the background.
+
+    With ``background_refresh=False`` no background refresh is started, e.g.
+    in worker processes whose parent refreshes the snapshot for them.
+    """
+
+    def __init__(self, backend: ReferenceBackend, path=SNAPSHOT_PATH, ttl: float = SNAPSHOT_TTL,
+                 background_refresh: bool = True):
+        self.backend = backend
+        self.path = str(path)
+        self.ttl = ttl
+        self.background_refresh = background_refresh
+        self._lock = threading.Lock()
+        self._refreshing = set()
+        self._mappings: Dict[str, tuple] = {}
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        with closing(self._connect()) as conn:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('CREATE TABLE IF NOT EXISTS snapshot_meta '
+                         '(name TEXT PRIMARY KEY, refreshed_at REAL)')
+            for name in REFERENCE_COLUMNS:
+                # Snapshots taken when values were stored as TEXT are dropped and taken again
+                columns = {row[1]: row[2] for row in conn.execute(f'PRAGMA table_info({name})')}
+                if columns.get('value'):
+                    conn.execute(f'DROP TABLE {name}')
+                    conn.execute(f'DROP TABLE IF EXISTS {name}_requested')
+                    conn.execute('DELETE FROM snapshot_meta WHERE name = ?', (name,))
+                # No type on value, so numbers come back as numbers and names as text
+                conn.execute(f'CREATE TABLE IF NOT EXISTS {name} '
+                             '(key INTEGER PRIMARY KEY, value)')
+                # Keys already looked up while the table had no full snapshot
+                conn.execute(f'CREATE TABLE IF NOT EXISTS {name}_requested '
+                             '(key INTEGER PRIMARY KEY)')
+            conn.commit()
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+
+    def refreshed_at(self, name: str) -> Optional[float]:
+        with closing(self._connect()) as conn:
+            row = conn.execute('SELECT refreshed_at FROM snapshot_meta WHERE name = ?',
+                               (name,)).fetchone()
+        return row[0] if row else None
+
+    def refresh(self, name: str) -> None:
+        """Take a full snapshot of a reference table from the backend."""
+        key, value = REFERENCE_COLUMNS[name]
+        df = self.backend.fetch_table(name)
+        rows = zip(normalize_keys(df[key]).tolist(), df[value].tolist())
+        with closing(self._connect()) as conn:
+            with conn:
+                conn.execute(f'DELETE FROM {name}')
+                conn.execute(f'DELETE FROM {name}_requested')
+                conn.executemany(f'INSERT OR REPLACE INTO {name} (key, value) VALUES (?, ?)', rows)
+                conn.execute('INSERT OR REPLACE INTO snapshot_meta (name, refreshed_at) VALUES (?, ?)',
+                             (name, time.time()))
+
+    def is_stale(self, name: str) -> bool:
+        """Whether a table has no full snapshot or one older than the TTL."""
+        refreshed_at = self.refreshed_at(name)
+        return refreshed_at is None or time.time() - refreshed_at > self.ttl
+
+    def refresh_in_background(self, name: str) -> None:
+        """Refresh a table on a daemon thread, unless a refresh is already running or they are disabled."""
+        if not self.background_refresh:
+            return
+        with self._lock:
+            if name in self._refreshing:
+                return
+            self._refreshing.add(name)
+
+        def run():
+            try:
+                self.refresh(name)
+            except Exception:
+                pass  # keep serving the previous snapshot; next access retries
+            finally:
+                with self._lock:
+                    self._refreshing.discard(name)
+
+        threading.Thread(target=run, name=f'refresh-{name}', daemon=True).start()
+
+    def mapping(self, name: str) -> Dict[int, str]:
+        """Return a reference table as {матичен број: value}."""
+        refreshed_at = self.refreshed_at(name)
+        if refreshed_at is None:
+            self.refresh(name)
+            refreshed_at = self.refreshed_at(name)
+        elif time.time() - refreshed_at > self.ttl:
+            self.refresh_in_background(name)
+
+        cached = self._mappings.get(name)
+        if cached is None or cached[0] != refreshed_at:
+            with step(f'reference snapshot {name}') as record, closing(self._connect()) as conn:
+                rows = conn.execute(f'SELECT key, value FROM {name}').fetchall()
+                record.rows_out = len(rows)
+            cached = (refreshed_at, dict(rows))
+            self._mappings[name] = cached
+        return cached[1]
+
+    def lookup(self, name: str, keys: Iterable[int]) -> Dict[int, str]:
+        """
+        Return {матичен број: value} covering at least ``keys``.
+
+        With a snapshot this is the full mapping. Without one, only keys not
+        requested before are sent to the backend, in bounded batches.
+        """
+        if self.refreshed_at(name) is not None:
+            return self.mapping(name)
+
+        keys = {int(k) for k in keys}
+        with closing(self._connect()) as conn:
+            requested = {row[0] for row in conn.execute(f'SELECT key FROM {name}_requested')}
+        missing = keys - requested
+        if missing:
+            key, value = REFERENCE_COLUMNS[name]
+            df = self.backend.fetch_keys(name, missing)
+            rows = zip(normalize_keys(df[key]).tolist(), df[value].tolist())
+            with closing(self._connect()) as conn:
+                with conn:
+                    conn.executemany(f'INSERT OR REPLACE INTO {name} (key, value) VALUES (?, ?)', rows)
+                    conn.executemany(f'INSERT OR IGNORE INTO {name}_requested (key) VALUES (?)',
+                                     [(k,) for k in missing])
+        self.refresh_in_background(name)
+
+        with closing(self._connect()) as conn:
+            local = dict(conn.execute(f'SELECT key, value FROM {name}'))
+        return {k: local[k] for k in keys if k in local}
+
+    def company_names(self) -> Dict[int, str]:
+        """матичен број -> Poln_naziv_DO from vwDanocni_num."""
+        return self.mapping('company_names')
+
+    def sectors(self) -> Dict[int, str]:
+        """матичен број -> Sektor from TblSektor."""
+        return self.mapping('sectors')
+
+
+_default_store: Optional[ReferenceStore] = None
+_default_store_lock = threading.Lock()
+
+
+def default_store() -> ReferenceStore:
+    """
+    Process-wide reference store.
+
+    Backed by SQL Server, or by the SQLite file named in ISIDORA_REFERENCE_SQLITE
+    for offline runs.
+    """
+    global _default_store
+    with _default_store_lock:
+        if _default_store is None:
+            sqlite_path = os.environ.get('ISIDORA_REFERENCE_SQLITE')
+            backend = SqliteBackend(sqlite_path) if sqlite_path else SqlServerBackend()
+            _default_store = ReferenceStore(backend)
+    return _default_store
@@ -0,0 +1,102 @@
+import re
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from cube import find_column
+
+
+class InvertedIndex:
+    """Distinct value -> sorted row positions, built from one factorize and one stable argsort."""
+
+    def __init__(self, series: pd.Series):
+        codes, self.values = pd.factorize(series)
+        order = np.argsort(codes, kind='stable')
+        bounds = np.searchsorted(codes[order], np.arange(len(self.values) + 1))
+        self._postings = {
+            value: order[bounds[i]:bounds[i + 1]] for i, value in enumerate(self.values)
+        }
+        self._labels = np.array([str(value) for value in self.values], dtype=object)
+
+    def positions(self, value) -> np.ndarray:
+        return self._postings.get(value, np.empty(0, dtype=np.intp))
+
+    def matching(self, pattern: str) -> np.ndarray:
+        """Positions of rows whose value contains the regex ``pattern``, tested once per distinct value."""
+        regex = re.compile(pattern)
+        hits = [self._postings[value] for value, label in zip(self.values, self._labels) if regex.search(label)]
+        return np.sort(np.concatenate(hits)) if hits else np.empty(0, dtype=np.intp)
+
+
+class DateIndex:
+    """Row positions sorted by date, for range lookups by binary search."""
+
+    def __init__(self, series: pd.Series):
+        dates = pd.to_datetime(series, errors='coerce').to_numpy(dtype='datetime64[ns]')
+        self._order = np.argsort(dates, kind='stable')  # NaT sorts last
+        self._sorted = dates[self._order]
+
+    def between(self, start, end) -> np.ndarray:
+        """Sorted positions of rows with start <= date <= end."""
+        lo = np.searchsorted(self._sorted, np.datetime64(pd.Timestamp(start), 'ns'), side='left')
+        hi = np.searchsorted(self._sorted, np.datetime64(pd.Timestamp(end), 'ns'), side='right')
+        return np.sort(self._order[lo:hi])
+
+
+class ReportIndex:
+    """
+    Indexes over a loaded report for the date, reporter and instrument filters.
+
+    Built once per dataset; every filter is answered by binary search or a
+    posting-list lookup, and combined filters intersect row positions instead
+    of rescanning or copying the frame.
+    """
+
+    def __init__(self, df: pd.DataFrame):
+        self.df = df
+        self.date = find_column(df.columns, 'датум')
+        self.reporter = find_column(df.columns, 'известувач')
+        self.instrument = find_column(df.columns, 'вид', 'х.в.')
+        self._dates = DateIndex(df[self.date]) if self.date else None
+        self._inverted: Dict[str, InvertedIndex] = {}
+
+    def inverted(self, column: str) -> InvertedIndex:
+        if column not in self._inverted:
+            self._inverted[column] = InvertedIndex(self.df[column])
+        return self._inverted[column]
+
+    def select(self, date_range: Optional[Tuple] = None,
+               reporter: Optional[str] = None,
+               instrument_type: Optional[str] = None,
+               exact_reporter: bool = False) -> Optional[np.ndarray]:
+        """
+        Sorted row positions matching every given filter; None when no filter applies.
+
+        ``reporter`` is matched as a regex against the reporter names, like
+        ``str.contains``, or must equal the name with ``exact_reporter`` (a value
+        picked from a list of members); ``instrument_type`` must match exactly.
+        """
+        selections = []
+        if date_range and self._dates is not None:
+            selections.append(self._dates.between(*date_range))
+        if reporter and self.reporter:
+            reporters = self.inverted(self.reporter)
+            selections.append(reporters.positions(reporter) if exact_reporter else reporters.matching(reporter))
+        if instrument_type and self.instrument:
+            selections.append(self.inverted(self.instrument).positions(instrument_type))
+        if not selections:
+            return None
+        # Intersect the smallest selections first
+        selections.sort(key=len)
+        positions = selections[0]
+        for other in selections[1:]:
+            positions = np.intersect1d(positions, other, assume_unique=True)
+        return positions
+
+    def filter(self, date_range: Optional[Tuple] = None,
+               reporter: Optional[str] = None,
+               instrument_type: Optional[str] = None,
+               exact_reporter: bool = False) -> pd.DataFrame:
+        """The matching rows, in their original order; the frame itself when no filter applies."""
+        positions = self.select(date_range, reporter, instrument_type, exact_reporter)
+        return self.df if positions is None else self.df.take(positions)
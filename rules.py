@@ -0,0 +1,124 @@
+from dataclasses import dataclass
+from typing import Callable, Dict, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+
+def broadcast_distinct(series: pd.Series, func: Callable, na_value=None) -> np.ndarray:
+    """
+    Apply ``func`` once per distinct value of ``series`` and broadcast the results.
+
+    Missing values get ``na_value``. The per-row work is a single NumPy take
+    over the factorized codes, so the cost is driven by the number of distinct
+    values rather than the number of rows.
+    """
+    codes, uniques = pd.factorize(series)
+    results = np.empty(len(uniques) + 1, dtype=object)
+    results[:-1] = [func(value) for value in uniques]
+    results[-1] = na_value  # code -1 (missing) picks the last slot
+    return results[codes]
+
+
+def normalized(series: pd.Series) -> np.ndarray:
+    """Stripped, upper-cased string values; missing values stay None."""
+    return broadcast_distinct(series, lambda value: str(value).strip().upper())
+
+
+@dataclass
+class Copy:
+    """target = source, unchanged."""
+    target: str
+    source: str
+
+    def apply(self, df: pd.DataFrame, lookups: Dict[str, Dict]) -> pd.Series:
+        return df[self.source]
+
+
+@dataclass
+class ValueMap:
+    """target = mapping[stripped, upper-cased source]; ``default`` when unmapped."""
+    target: str
+    source: str
+    mapping: Dict[str, str]
+    default: str = ''
+
+    def apply(self, df: pd.DataFrame, lookups: Dict[str, Dict]) -> np.ndarray:
+        return broadcast_distinct(
+            df[self.source],
+            lambda value: self.mapping.get(str(value).strip().upper(), self.default),
+            na_value=self.default
+        )
+
+
+@dataclass
+class FlagSet:
+    """target = the ``flags`` found as substrings of source, joined by ``sep``; ``default`` if none."""
+    target: str
+    source: str
+    flags: Sequence[str]
+    sep: str = ', '
+    default: str = '-'
+
+    def apply(self, df: pd.DataFrame, lookups: Dict[str, Dict]) -> np.ndarray:
+        def found(value):
+            text = str(value)
+            return self.sep.join(flag for flag in self.flags if flag in text) or self.default
+        return broadcast_distinct(df[self.source], found, na_value=self.default)
+
+
+@dataclass
+class KeyLookup:
+    """
+    target = lookups[lookup][int(source)] for all-digit source values; ``default`` otherwise.
+
+    The mapping itself is supplied when the rules are applied, so reference data
+    can change without changing the rule.
+    """
+    target: str
+    source: str
+    lookup: str
+    default: str = ''
+
+    def apply(self, df: pd.DataFrame, lookups: Dict[str, Dict]) -> np.ndarray:
+        mapping = lookups[self.lookup]
+
+        def resolve(value):
+            text = str(value)
+            return mapping.get(int(text), self.default) if text.isdigit() else self.default
+        return broadcast_distinct(df[self.source], resolve, na_value=self.default)
+
+
+@dataclass
+class Select:
+    """
+    target = the choice column of the first matching condition; ``default`` if none match.
+
+    Each condition is {column: expected value}, compared against the stripped,
+    upper-cased column and combined with AND.
+    """
+    target: str
+    conditions: Sequence[Dict[str, str]]
+    choices: Sequence[str]
+    default: str = ''
+
+    def apply(self, df: pd.DataFrame, lookups: Dict[str, Dict]) -> np.ndarray:
+        normalized_columns = {}
+        masks = []
+        for condition in self.conditions:
+            mask = np.ones(len(df), dtype=bool)
+            for col, expected in condition.items():
+                if col not in normalized_columns:
+                    normalized_columns[col] = normalized(df[col])
+                mask &= normalized_columns[col] == expected
+            masks.append(mask)
+        choices = [df[col].to_numpy() for col in self.choices]
+        return np.select(masks, choices, default=self.default)
+
+
+def apply_rules(df: pd.DataFrame, rules: Sequence, lookups: Optional[Dict[str, Dict]] = None) -> pd.DataFrame:
+    """Add the column of every rule to ``df``, in order; later rules may use earlier targets."""
+    lookups = lookups or {}
+    for rule in rules:
+        df[rule.target] = rule.apply(df, lookups)
+    return df
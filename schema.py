@@ -0,0 +1,119 @@
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Tuple
+
+import pandas as pd
+from normalize import CATEGORICAL_COLUMNS, to_categorical
+
+# Reporting dates entered as text in the workbooks; real Excel dates need no format
+DATE_FORMAT = '%d.%m.%Y'
+
+
+def _to_date(series: pd.Series) -> pd.Series:
+    dates = pd.to_datetime(series, format=DATE_FORMAT, errors='coerce')
+    failed = dates.isna() & series.notna()
+    if failed.any():  # ISO text and other layouts
+        dates[failed] = pd.to_datetime(series[failed], format='mixed', dayfirst=True, errors='coerce')
+    return dates
+
+
+def _is_categorical(series: pd.Series) -> bool:
+    return isinstance(series.dtype, pd.CategoricalDtype)
+
+
+# Column type -> (already converted?, converter). Columns that already have their
+# type are skipped, so a value is converted once even if a schema is applied again.
+CONVERTERS: Dict[str, Tuple[Callable, Callable]] = {
+    'numeric': (pd.api.types.is_numeric_dtype, lambda s: pd.to_numeric(s, errors='coerce')),
+    # матичен број: integer, missing or malformed as 0, the way the mappings are keyed
+    'key': (pd.api.types.is_integer_dtype,
+            lambda s: pd.to_numeric(s, errors='coerce').fillna(0).astype(int)),
+    'date': (pd.api.types.is_datetime64_any_dtype, _to_date),
+    # Names used as mapping keys: text, stripped and upper-cased
+    'name': (lambda s: False, lambda s: s.astype(str).str.strip().str.upper()),
+    'category:strip': (_is_categorical, lambda s: to_categorical(s, 'strip')),
+    'category:upper': (_is_categorical, lambda s: to_categorical(s, 'upper')),
+}
+
+
+@dataclass
+class SheetSchema:
+    """Column types of one ISIDORA sheet and the columns its readers need."""
+    types: Dict[str, str]
+    usecols: Optional[List[str]] = None
+
+
+SHEET_SCHEMAS: Dict[str, SheetSchema] = {
+    'Примени податоци': SheetSchema(
+        types={
+            'Износ во денари': 'numeric',
+            'Извештаен датум': 'date',
+            **{col: f'category:{transform}' for col, transform in CATEGORICAL_COLUMNS.items()},
+        },
+        usecols=[
+            'Известувач', 'Вид на износ', 'Износ во денари', 'Пакет',
+            'Извештаен датум', 'Позиција', 'Идентификатор на хартија од вредност',
+            'Алфанумеричка ознака на хартија од вредност', 'Котација',
+            'Тип на договорна страна',
+            'Земја',
+            'Сектор',
+            'Идентификациски код на договорна страна'
+        ],
+    ),
+    'листа известувачи': SheetSchema(
+        types={'Опис МК': 'name', 'матичен број': 'key'},
+        usecols=['Опис МК', 'матичен број'],
+    ),
+}
+
+
+def schema_for(sheet_name: str) -> Optional[SheetSchema]:
+    """Schema of a sheet, ignoring the stray spaces some workbooks have in sheet names."""
+    return SHEET_SCHEMAS.get(str(sheet_name).strip())
+
+
+def convert_columns(df: pd.DataFrame, types: Dict[str, str]) -> pd.DataFrame:
+    """
+    Convert the columns of ``df`` named in ``types`` (matched ignoring surrounding spaces) in place.
+
+    Columns that already have their type are left alone.
+    """
+    by_name = {str(col).strip(): col for col in df.columns}
+    for name, kind in types.items():
+        col = by_name.get(name)
+        if col is None:
+            continue
+        converted, convert = CONVERTERS[kind]
+        if not converted(df[col]):
+            df[col] = convert(df[col])
+    return df
+
+
+def apply_schema(df: pd.DataFrame, sheet_name: str) -> pd.DataFrame:
+    """Apply the schema of ``sheet_name``, if it has one, to a parsed sheet."""
+    schema = schema_for(sheet_name)
+    return convert_columns(df, schema.types) if schema else df
+
+
+# Inferred types of object columns that Arrow stores as they are
+ARROW_OBJECT_TYPES = frozenset({
+    'string', 'integer', 'floating', 'mixed-integer-float', 'decimal', 'boolean', 'date', 'datetime', 'empty',
+})
+
+
+def arrow_types(df: pd.DataFrame) -> Dict[str, str]:
+    """
+    The object columns of ``df`` that Arrow cannot store as one type, mapped to 'string'.
+
+    Such columns mix types, e.g. numeric counterparty codes and LEI codes in
+    'Идентификациски код на договорна страна'; they are stored as text.
+    """
+    return {
+        col: 'string' for col in df.columns
+        if df[col].dtype == object and pd.api.types.infer_dtype(df[col], skipna=True) not in ARROW_OBJECT_TYPES
+    }
+
+
+def arrow_compatible(df: pd.DataFrame) -> pd.DataFrame:
+    """``df`` with its mixed-type object columns as text, so that Parquet can store it."""
+    types = arrow_types(df)
+    return df.astype(types) if types else df
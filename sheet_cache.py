@@ -0,0 +1,151 @@
+import hashlib
+import json
+import os
+import shutil
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import pandas as pd
+from schema import arrow_compatible
+
+# Bump whenever parsing or schema handling changes, so old entries are ignored
+PARSER_VERSION = 2
+
+CACHE_DIR = Path(os.environ.get('ISIDORA_CACHE_DIR', Path.home() / '.cache' / 'isidora'))
+MAX_CACHE_BYTES = int(os.environ.get('ISIDORA_CACHE_MAX_MB', '2048')) * 1024 * 1024
+
+MANIFEST = 'manifest.json'
+
+
+def _directory_size(path: Path) -> int:
+    return sum(f.stat().st_size for f in path.iterdir() if f.is_file())
+
+
+class SheetCache:
+    """
+    On-disk columnar cache of parsed sheets, keyed by workbook SHA-256 and parser version.
+
+    Each workbook gets its own directory holding one Parquet file per sheet and a
+    manifest with the sheet names. Mixed-type object columns are stored as text
+    (schema.arrow_compatible); only sheets Arrow still cannot represent (e.g.
+    non-string headers) fall back to pickle in the same entry.
+    Entries are evicted least-recently-used once the cache exceeds ``max_bytes``.
+    """
+
+    def __init__(self, root: Path = CACHE_DIR / 'sheets', max_bytes: int = MAX_CACHE_BYTES,
+                 version: int = PARSER_VERSION):
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+        self.version = version
+        self._lock = threading.Lock()
+
+    def _entry(self, digest: str) -> Path:
+        return self.root / f'{digest}-v{self.version}'
+
+    def _read_manifest(self, entry: Path) -> Dict:
+        try:
+            with open(entry / MANIFEST, encoding='utf-8') as handle:
+                return json.load(handle)
+        except (OSError, ValueError):
+            return {'sheet_names': None, 'files': {}}
+
+    def _write_manifest(self, entry: Path, manifest: Dict) -> None:
+        tmp = entry / f'{MANIFEST}.{os.getpid()}.{threading.get_ident()}.tmp'
+        with open(tmp, 'w', encoding='utf-8') as handle:
+            json.dump(manifest, handle, ensure_ascii=False)
+        os.replace(tmp, entry / MANIFEST)
+
+    def _touch(self, entry: Path) -> None:
+        try:
+            os.utime(entry)
+        except OSError:
+            pass
+
+    def sheet_names(self, digest: str) -> Optional[List[str]]:
+        """Cached sheet names of a workbook, or None on a miss."""
+        entry = self._entry(digest)
+        names = self._read_manifest(entry).get('sheet_names')
+        if names is not None:
+            self._touch(entry)
+        return names
+
+    def store_sheet_names(self, digest: str, names: List[str]) -> None:
+        entry = self._entry(digest)
+        with self._lock:
+            entry.mkdir(parents=True, exist_ok=True)
+            manifest = self._read_manifest(entry)
+            manifest['sheet_names'] = list(names)
+            self._write_manifest(entry, manifest)
+
+    def load(self, digest: str, sheet_name: str) -> Optional[pd.DataFrame]:
+        """Load a cached sheet, or return None on a miss."""
+        entry = self._entry(digest)
+        filename = self._read_manifest(entry)['files'].get(sheet_name)
+        if filename is None:
+            return None
+        path = entry / filename
+        try:
+            if path.suffix == '.parquet':
+                frame = pd.read_parquet(path)
+            else:
+                frame = pd.read_pickle(path)
+        except Exception:
+            return None
+        self._touch(entry)
+        return frame
+
+    def store(self, digest: str, sheet_name: str, frame: pd.DataFrame) -> None:
+        """Persist a parsed sheet and evict old workbooks if over budget."""
+        entry = self._entry(digest)
+        entry.mkdir(parents=True, exist_ok=True)
+        stem = hashlib.sha1(sheet_name.encode('utf-8')).hexdigest()[:16]
+        tmp_suffix = f'.{os.getpid()}.{threading.get_ident()}.tmp'
+
+        filename = f'{stem}.parquet'
+        tmp = entry / (filename + tmp_suffix)
+        try:
+            arrow_compatible(frame).to_parquet(tmp, index=False)
+        except Exception:
+            # Arrow needs string headers; keep the frame as-is
+            tmp.unlink(missing_ok=True)
+            filename = f'{stem}.pkl'
+            tmp = entry / (filename + tmp_suffix)
+            frame.to_pickle(tmp)
+        os.replace(tmp, entry / filename)
+
+        with self._lock:
+            manifest = self._read_manifest(entry)
+            manifest['files'][sheet_name] = filename
+            self._write_manifest(entry, manifest)
+            self._evict(keep=entry)
+
+    def _evict(self, keep: Path) -> None:
+        if not self.root.exists():
+            return
+        entries = [(p.stat().st_mtime, p) for p in self.root.iterdir() if p.is_dir()]
+        sizes = {p: _directory_size(p) for _, p in entries}
+        total = sum(sizes.values())
+        for _, entry in sorted(entries, key=lambda item: item[0]):
+            if total <= self.max_bytes:
+                break
+            if entry == keep:
+                continue
+            shutil.rmtree(entry, ignore_errors=True)
+            total -= sizes[entry]
+
+    def clear(self) -> None:
+        shutil.rmtree(self.root, ignore_errors=True)
+
+
+_default_cache: Optional[SheetCache] = None
+
+
+def default_cache() -> Optional[SheetCache]:
+    """Process-wide cache instance; disabled when ISIDORA_CACHE_DIR is set to an empty string."""
+    global _default_cache
+    if os.environ.get('ISIDORA_CACHE_DIR') == '':
+        return None
+    if _default_cache is None:
+        _default_cache = SheetCache()
+    return _default_cache
@@ -0,0 +1,157 @@
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+from fingerprint import duplicate_mask, row_fingerprints
+from normalize import map_values, to_categorical
+
+OPENING = 'Состојба на х.в на почеток на период (главнина)'
+CLOSING = 'Состојба на х.в на крај на период (главнина)'
+FLOWS = ['Нето трансакции', 'Ценовни промени', 'Курсни разлики', 'Останати промени']
+COMPONENTS = [OPENING] + FLOWS + [CLOSING]
+
+# Вид на износ codes that make up the principal stock. A workbook reports the
+# stock at its reporting date, i.e. the closing stock of its period; the opening
+# stock is the closing stock of the previous period (see positions.PositionStore).
+STOCK_AMOUNT_TYPES = ['DRVR', 'DSK', 'PRM', 'POBJ']
+
+# Candidate columns identifying the reporter and the security, in order of preference
+REPORTER_COLUMNS = ['Матичен број на известувач', 'Известувач']
+SECURITY_COLUMNS = ['Алфанумеричка ознака на хартија од вредност', 'ISIN']
+
+# Largest |closing - (opening + flows)| in denars accepted per position
+IDENTITY_TOLERANCE = 1.0
+
+
+def _first_present(df: pd.DataFrame, candidates: Sequence[str]) -> Optional[str]:
+    return next((col for col in candidates if col in df.columns), None)
+
+
+def component_of_amount_type(flow_types: Dict[str, List[str]]) -> Dict[str, str]:
+    """
+    Вид на износ code -> the stock-flow component it is booked to.
+
+    ``flow_types`` lists the codes reported for each flow ({flow: [codes]}).
+    The ISIDORA codes of the flows are set by the analyst, not here; a flow
+    without codes is not available and is never treated as zero.
+    """
+    unknown = set(flow_types) - set(FLOWS)
+    if unknown:
+        raise ValueError(f"Unknown flow components: {sorted(unknown)}")
+    mapping = {code: CLOSING for code in STOCK_AMOUNT_TYPES}
+    for component, codes in flow_types.items():
+        for code in codes:
+            if code in mapping:
+                raise ValueError(f"Вид на износ '{code}' is booked to both '{mapping[code]}' and '{component}'")
+            mapping[code] = component
+    return mapping
+
+
+def _join_opening(positions: pd.DataFrame, keys: Dict[str, Optional[str]],
+                  opening: pd.DataFrame, keep_closed: bool) -> pd.DataFrame:
+    """Add the OPENING column: the prior closing of every position, 0 for new ones."""
+    position_keys = [col for col in keys.values() if col]
+    prior = opening.rename(columns={label: col for label, col in keys.items() if col})
+    if not position_keys:
+        return positions.assign(**{OPENING: float(prior['closing'].sum())})
+    # A position already closed in the prior period has nothing to carry over
+    prior = (prior[prior['closing'] != 0].astype({col: str for col in position_keys})
+             .groupby(position_keys, as_index=False)['closing'].sum()
+             .rename(columns={'closing': OPENING}))
+    # Positions only in the prior period were closed during this one
+    positions = positions.merge(prior, on=position_keys, how='outer' if keep_closed else 'left')
+    components = [col for col in positions.columns if col not in position_keys]
+    positions[components] = positions[components].fillna(0.0)
+    return positions
+
+
+def compute_stock_flow(df: pd.DataFrame,
+                       flow_types: Dict[str, List[str]],
+                       opening: Optional[pd.DataFrame] = None,
+                       keep_closed: bool = True,
+                       tolerance: float = IDENTITY_TOLERANCE) -> Dict:
+    """
+    Compute every Прв Тест Пакет column in one grouped pass.
+
+    Rows are classified by Вид на износ into the principal stock (the closing
+    stock of the period) and the flow components ``flow_types`` ({flow:
+    [codes]}, see component_of_amount_type), summed once per reporter ×
+    security × Вид на износ and pivoted into one row per position.
+
+    ``opening`` holds the closing positions of the previous period ('reporter',
+    'security' and 'closing', as PositionStore.opening_positions returns them);
+    it is joined onto the positions as the opening stock. Positions found only
+    there were closed during the period and are kept with a zero closing stock,
+    unless ``keep_closed`` is False (for a filtered view of a file, whose other
+    positions are out of scope). Where the opening and every flow are
+    available, the stock-flow identity (closing = opening + flows) is checked
+    per position in the same pass.
+
+    Returns a dict with 'positions' (one row per reporter × security, the keys
+    as strings), 'keys' ({'reporter': column, 'security': column}), 'totals'
+    (sum per component), 'available' (components that could be computed),
+    'violations' (positions breaking the identity) and 'filtered_df' (the rows
+    that were used).
+    """
+    required_cols = ['Вид на износ', 'Износ во денари']
+    if not all(col in df.columns for col in required_cols):
+        raise ValueError(f"Missing required columns: {required_cols}")
+    components = component_of_amount_type(flow_types)
+
+    amount_type = df['Вид на износ']
+    if not isinstance(amount_type.dtype, pd.CategoricalDtype):
+        amount_type = to_categorical(amount_type, 'upper')
+    used_mask = map_values(amount_type, components).notna().to_numpy()
+
+    # One filter and one copy for every component
+    used = df[used_mask].copy()
+    used['Вид на износ'] = amount_type[used_mask]
+    if not pd.api.types.is_numeric_dtype(used['Износ во денари']):
+        used['Износ во денари'] = pd.to_numeric(used['Износ во денари'], errors='coerce')
+    # Repeated rows are dropped by fingerprint: one hash pass instead of a sort per column
+    used = used[~duplicate_mask(row_fingerprints(used))]
+    used = used[used['Износ во денари'].notna()]
+
+    keys = {'reporter': _first_present(used, REPORTER_COLUMNS),
+            'security': _first_present(used, SECURITY_COLUMNS)}
+    position_keys = [col for col in keys.values() if col]
+
+    # The single grouped pass: reporter × security × Вид на износ
+    grouped = used.groupby(position_keys + ['Вид на износ'], observed=True, dropna=False)['Износ во денари'].sum()
+    grouped = grouped.reset_index()
+    grouped['Компонента'] = map_values(grouped['Вид на износ'], components)
+    if position_keys:
+        positions = (grouped.groupby(position_keys + ['Компонента'], observed=True, dropna=False)['Износ во денари']
+                     .sum().unstack('Компонента', fill_value=0.0))
+    else:
+        positions = grouped.groupby('Компонента')['Износ во денари'].sum().to_frame().T
+    positions.columns = list(positions.columns)
+    positions = positions.reset_index() if position_keys else positions.reset_index(drop=True)
+    positions = positions.astype({col: str for col in position_keys})
+
+    available = [flow for flow in FLOWS if flow_types.get(flow)] + [CLOSING]
+    for col in available:
+        if col not in positions.columns:
+            positions[col] = 0.0
+    if opening is not None:
+        positions = _join_opening(positions, keys, opening, keep_closed)
+        available.insert(0, OPENING)
+
+    # Stock-flow identity: closing = opening + flows, checked per position
+    identity_checked = opening is not None and all(flow_types.get(flow) for flow in FLOWS)
+    if identity_checked:
+        positions['Разлика'] = positions[CLOSING] - positions[[OPENING] + FLOWS].sum(axis=1)
+    violations = positions[np.abs(positions['Разлика']) > tolerance] if identity_checked else positions.iloc[0:0]
+
+    columns = [col for col in COMPONENTS if col in available]
+    positions = positions[position_keys + columns + (['Разлика'] if identity_checked else [])]
+    return {
+        'positions': positions,
+        'keys': keys,
+        'totals': positions[columns].sum(),
+        'available': columns,
+        'identity_checked': identity_checked,
+        'violations': violations[positions.columns],
+        'used_types': STOCK_AMOUNT_TYPES,
+        'filtered_df': used,
+    }
@@ -0,0 +1,90 @@
+from typing import Callable, Collection, Dict, Iterator, List, Optional, Sequence
+
+import pandas as pd
+from normalize import CATEGORICAL_COLUMNS, TRANSFORMS
+from openpyxl import load_workbook
+from schema import convert_columns
+
+# Rows per chunk when streaming a sheet; peak memory scales with this, not the file
+DEFAULT_CHUNK_SIZE = 50_000
+
+
+def _header_names(header_row: Sequence) -> List[str]:
+    """Column names as read_excel would give them for a header row."""
+    return [f'Unnamed: {i}' if value is None else value for i, value in enumerate(header_row)]
+
+
+def _cell_filter(column: str, allowed: Collection) -> Callable[[object], bool]:
+    """
+    Whether a raw cell of ``column`` is one of the ``allowed`` values.
+
+    The cell is normalized (stripped, upper-cased) the way the in-memory path
+    normalizes the column, so both paths keep the same rows; each distinct
+    cell value is normalized once.
+    """
+    transform = TRANSFORMS[CATEGORICAL_COLUMNS[column]] if column in CATEGORICAL_COLUMNS else (lambda value: value)
+    allowed = {transform(value) for value in allowed}
+    seen: Dict[object, bool] = {}
+
+    def keep(value) -> bool:
+        if value not in seen:
+            seen[value] = transform(value) in allowed
+        return seen[value]
+    return keep
+
+
+def iter_sheet_chunks(excel_file,
+                      sheet_name: str,
+                      usecols: Optional[Sequence[str]] = None,
+                      chunk_size: int = DEFAULT_CHUNK_SIZE,
+                      row_filter: Optional[Dict[str, Collection]] = None,
+                      types: Optional[Dict[str, str]] = None) -> Iterator[pd.DataFrame]:
+    """
+    Stream a sheet as DataFrame chunks of at most ``chunk_size`` rows.
+
+    The workbook is opened in openpyxl read-only mode and rows are read one at a
+    time, so only the current chunk is ever held in memory. ``usecols`` projects
+    the columns and ``row_filter`` ({column: allowed values}) drops rows before
+    they are buffered. ``types`` maps columns to schema column types (see
+    schema.CONVERTERS) and is applied to every chunk. The index of each chunk is the row's position in
+    the sheet, the same index read_excel would have given it.
+    """
+    if hasattr(excel_file, 'seek'):
+        excel_file.seek(0)
+    wb = load_workbook(excel_file, read_only=True, data_only=True)
+    try:
+        rows = wb[sheet_name].iter_rows(values_only=True)
+        header = _header_names(next(rows, ()))
+
+        wanted = set(header if usecols is None else usecols)
+        columns = [col for col in header if col in wanted]
+        missing = [col for col in (usecols or []) if col not in header]
+        if missing:
+            raise ValueError(f"Missing columns in sheet '{sheet_name}': {missing}")
+        positions = [header.index(col) for col in columns]
+
+        filters = []
+        for col, allowed in (row_filter or {}).items():
+            if col not in header:
+                raise ValueError(f"Missing filter column in sheet '{sheet_name}': {col}")
+            filters.append((header.index(col), _cell_filter(col, allowed)))
+
+        buffer, index = [], []
+        for row_number, row in enumerate(rows):
+            if len(row) < len(header):
+                row = tuple(row) + (None,) * (len(header) - len(row))
+            if not all(keep(row[pos]) for pos, keep in filters):
+                continue
+            values = tuple(row[pos] for pos in positions)
+            if all(value is None for value in values):
+                continue
+            buffer.append(values)
+            index.append(row_number)
+            if len(buffer) >= chunk_size:
+                yield convert_columns(pd.DataFrame(buffer, columns=columns, index=index), types or {})
+                buffer, index = [], []
+
+        if buffer:
+            yield convert_columns(pd.DataFrame(buffer, columns=columns, index=index), types or {})
+    finally:
+        wb.close()
@@ -1,6 +1,14 @@
 import pandas as pd
 import numpy as np
 from typing import Dict, List, Tuple, Optional
+from workbook import open_workbook
+from instrumentation import step, trace
+from normalize import normalize_categoricals
+from schema import apply_schema, convert_columns, schema_for
+from stock_flow import STOCK_AMOUNT_TYPES
+from report_index import ReportIndex
+from export import export_frame, format_for_filename, write_xlsx
+from fingerprint import drop_duplicate_rows
 
 def detect_header_row(df: pd.DataFrame) -> int:
     """
@@ -46,29 +54,9 @@ def filter_data(df: pd.DataFrame,
                 instrument_type: Optional[str] = None) -> pd.DataFrame:
     """
     Филтрира податоци според датум, известувач и тип на инструмент.
+    За повеќекратно филтрирање на истите податоци користете ReportIndex.
     """
-    filtered_df = df.copy()
-    
-    if date_range:
-        date_cols = [col for col in df.columns if 'датум' in safe_str_operation(col)]
-        if date_cols:
-            filtered_df = filtered_df[
-                (filtered_df[date_cols[0]] >= date_range[0]) &
-                (filtered_df[date_cols[0]] <= date_range[1])
-            ]
-    
-    if reporter:
-        reporter_cols = [col for col in df.columns if 'известувач' in safe_str_operation(col)]
-        if reporter_cols:
-            filtered_df = filtered_df[filtered_df[reporter_cols[0]].astype(str).str.contains(reporter, na=False)]
-    
-    if instrument_type:
-        instrument_cols = [col for col in df.columns 
-                         if 'вид' in safe_str_operation(col) and 'х.в.' in safe_str_operation(col)]
-        if instrument_cols:
-            filtered_df = filtered_df[filtered_df[instrument_cols[0]] == instrument_type]
-    
-    return filtered_df
+    return ReportIndex(df).filter(date_range, reporter, instrument_type)
 
 def summarize_data(df: pd.DataFrame) -> Dict:
     """
@@ -100,30 +88,61 @@ def summarize_data(df: pd.DataFrame) -> Dict:
 def export_to_excel(df: pd.DataFrame, filename: str) -> None:
     """
     Извезува DataFrame во Excel со соодветно форматирање.
+    Редовите се запишуваат последователно (write-only), а ширината на колоните се проценува од примерок.
     """
-    writer = pd.ExcelWriter(filename, engine='openpyxl')
-    df.to_excel(writer, index=False, sheet_name='Извештај')
-    
-    # Форматирање на колоните
-    for column in df.columns:
-        column_width = max(df[column].astype(str).map(len).max(), len(str(column)))
-        col_idx = df.columns.get_loc(column)
-        writer.sheets['Извештај'].column_dimensions[chr(65 + col_idx)].width = column_width + 2
-    
-    writer.close()
+    write_xlsx(df, filename, sheet_name='Извештај')
 
 class IsidoraReport:
     def __init__(self):
         self.data = None
         self.metadata = {}
+
+    @property
+    def data(self) -> Optional[pd.DataFrame]:
+        return self._data
+
+    @data.setter
+    def data(self, value: Optional[pd.DataFrame]) -> None:
+        # Индексот за филтрите се гради повторно само кога ќе се сменат податоците
+        self._data = value
+        self._index = None
+
+    @property
+    def index(self) -> ReportIndex:
+        """
+        Индекс за филтрирање, изграден еднаш за вчитаните податоци.
+        """
+        if self._index is None:
+            self._index = ReportIndex(self.data)
+        return self._index
+
+    def filter(self, date_range: Optional[Tuple] = None,
+               reporter: Optional[str] = None,
+               instrument_type: Optional[str] = None,
+               exact_reporter: bool = False) -> pd.DataFrame:
+        """
+        Филтрира податоци по датум, известувач и тип на инструмент преку индексот, без копирање.
+        Со exact_reporter известувачот мора да се совпаѓа целосно (избор од листа).
+        """
+        return self.index.filter(date_range, reporter, instrument_type, exact_reporter)
     
     def load_data(self, excel_file: str, sheet_name: str) -> None:
         """
         Вчитува податоци од Excel датотека.
+        Листот се чита од кешот ако истата датотека веќе била вчитана.
+        Времето, редовите и меморијата по фаза се запишуваат како трага 'load_data'.
         """
         try:
-            df = pd.read_excel(excel_file, sheet_name=sheet_name)
-            self.data = clean_headers(df)
+            with trace('load_data', source=excel_file, sheet=sheet_name):
+                # Типовите од шемата на листот се применуваат при парсирање
+                df = open_workbook(excel_file).sheet(sheet_name)
+                with step('clean_headers', rows_in=len(df)) as record:
+                    df = clean_headers(df)
+                    record.rows_out = len(df)
+                # Ако заглавјето не било во првиот ред, шемата се применува тука (еднаш по колона);
+                # кај другите листови колоните со мал број различни вредности се чуваат како категории
+                with step('types', rows_in=len(df)):
+                    self.data = apply_schema(df, sheet_name) if schema_for(sheet_name) else normalize_categoricals(df)
             self.metadata = {
                 'извор': excel_file,
                 'лист': sheet_name,
@@ -136,13 +155,13 @@ class IsidoraReport:
         """
         Филтрира податоци по датум.
         """
-        return filter_data(self.data, date_range=(start_date, end_date))
+        return self.filter(date_range=(start_date, end_date))
     
     def filter_by_reporter(self, reporter: str) -> pd.DataFrame:
         """
         Филтрира податоци по известувач.
         """
-        return filter_data(self.data, reporter=reporter)
+        return self.filter(reporter=reporter)
     
     def summarize_by_instrument(self) -> Dict:
         """
@@ -164,30 +183,40 @@ class IsidoraReport:
         except:
             return {}
     
-    def export_report(self, filename: str) -> None:
+    def export_report(self, filename: str, fmt: Optional[str] = None,
+                      data: Optional[pd.DataFrame] = None) -> None:
         """
-        Извезува извештај во Excel.
+        Извезува извештај во xlsx, Parquet или CSV (и компресиран со gzip/zstd).
+        Форматот се одредува од наставката на датотеката ако не е зададен.
+        Се извезуваат ``data`` (на пр. редовите од filter) ако се дадени, инаку сите податоци.
+        Извозот се запишува како трага 'export_report'.
         """
-        if self.data is not None:
-            export_to_excel(self.data, filename)
+        data = self.data if data is None else data
+        if data is not None:
+            fmt = fmt or format_for_filename(filename)
+            with trace('export_report', source=filename, format=fmt), \
+                    step(f'export {fmt}', rows_in=len(data)):
+                export_frame(data, fmt, target=filename, sheet_name='Извештај')
 
-def prepare_sostojba_na_hv(df_received):
+def prepare_sostojba_na_hv(df_received, key: Optional[List[str]] = None):
     """
     Prepares the correct sum for 'Состојба на х.в на почеток на период (главнина)',
     filtering strictly Вид на износ as DRVR, DSK, PRM, POBJ.
+
+    Дупликатите се отстрануваат според отпечатокот на редот по колоните во
+    ``key`` (сите колони ако е None), на пр. fingerprint.FINGERPRINT_KEY.
     """
     required_cols = ["Вид на износ", "Износ во денари"]
     if not all(col in df_received.columns for col in required_cols):
         raise ValueError(f"Missing required columns: {required_cols}")
 
-    valid_types = ["DRVR", "DSK", "PRM", "POBJ"]
+    valid_types = STOCK_AMOUNT_TYPES
 
-    df = df_received.copy()
-    df["Вид на износ"] = df["Вид на износ"].astype(str).str.strip().str.upper()
-    df["Износ во денари"] = pd.to_numeric(df["Износ во денари"], errors="coerce")
+    # Колоните што веќе се типизирани при читањето не се конвертираат повторно
+    df = convert_columns(df_received.copy(), {"Вид на износ": "category:upper", "Износ во денари": "numeric"})
 
     filtered_df = df[df["Вид на износ"].isin(valid_types)]
-    filtered_df = filtered_df.drop_duplicates()
+    filtered_df = drop_duplicate_rows(filtered_df, key)
     filtered_df = filtered_df[filtered_df["Износ во денари"].notna()]
 
     total_sum = filtered_df["Износ во денари"].sum()
@@ -0,0 +1,249 @@
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+from instrumentation import step, trace
+from rules import normalized
+
+IDENTIFIER = 'Идентификатор на хартија од вредност'
+SECURITY = 'Алфанумеричка ознака на хартија од вредност'
+LISTING = 'Котација'
+COUNTERPARTY_TYPE = 'Тип на договорна страна'
+COUNTRY = 'Земја'
+
+# Тип на договорна страна: R/N (resident/non-resident) and L/I/S
+COUNTERPARTY_TYPES = ['RL', 'RI', 'RS', 'NL', 'NI', 'NS']
+DOMESTIC_COUNTRY = 'MK'
+
+# ISO 3166-1 alpha-2 country codes
+COUNTRY_CODES = frozenset('''
+AD AE AF AG AI AL AM AO AQ AR AS AT AU AW AX AZ BA BB BD BE BF BG BH BI BJ BL BM BN BO BQ BR BS
+BT BV BW BY BZ CA CC CD CF CG CH CI CK CL CM CN CO CR CU CV CW CX CY CZ DE DJ DK DM DO DZ EC EE
+EG EH ER ES ET FI FJ FK FM FO FR GA GB GD GE GF GG GH GI GL GM GN GP GQ GR GS GT GU GW GY HK HM
+HN HR HT HU ID IE IL IM IN IO IQ IR IS IT JE JM JO JP KE KG KH KI KM KN KP KR KW KY KZ LA LB LC
+LI LK LR LS LT LU LV LY MA MC MD ME MF MG MH MK ML MM MN MO MP MQ MR MS MT MU MV MW MX MY MZ NA
+NC NE NF NG NI NL NO NP NR NU NZ OM PA PE PF PG PH PK PL PM PN PR PS PT PW PY QA RE RO RS RU RW
+SA SB SC SD SE SG SH SI SJ SK SL SM SN SO SR SS ST SV SX SY SZ TC TD TF TG TH TJ TK TL TM TN TO
+TR TT TV TW TZ UA UG UM US UY UZ VA VC VE VG VI VN VU WF WS YE YT ZA ZM ZW XK
+'''.split())
+
+# Row labels listed per rule in the summary table; the report keeps all of them
+EXAMPLE_ROWS = 10
+
+
+def isin_characters(text: np.ndarray) -> np.ndarray:
+    """Base-36 value (0-9, A=10 ... Z=35) of the first 12 characters of every string, -1 where invalid or missing."""
+    codes = np.ascontiguousarray(text, dtype='U12').view(np.uint32).reshape(len(text), 12).astype(np.int64)
+    digits, letters = (codes >= 48) & (codes <= 57), (codes >= 65) & (codes <= 90)
+    return np.where(digits, codes - 48, np.where(letters, codes - 55, -1))
+
+
+def isin_checks(values: Sequence) -> Dict[str, np.ndarray]:
+    """
+    'well_formed' and 'check_digit' masks for an array of ISINs, computed column by column.
+
+    An ISIN is two letters, nine letters or digits and a check digit, after
+    stripping and upper-casing. Letters count as two digits (A=10), and the
+    digit string must pass the Luhn check.
+    """
+    text = np.char.upper(np.char.strip(np.asarray(values, dtype=object).astype(str).astype('U')))
+    chars = isin_characters(text)
+    well_formed = ((np.char.str_len(text) == 12) & (chars >= 0).all(axis=1)
+                   & (chars[:, :2] >= 10).all(axis=1) & (chars[:, 11] < 10))
+
+    def luhn(digit: np.ndarray, position: np.ndarray) -> np.ndarray:
+        doubled = digit * 2
+        return np.where(position % 2 == 1, doubled - 9 * (doubled > 9), digit)
+
+    # Digits are counted from the right, the check digit at position 0
+    total = np.zeros(len(text), dtype=np.int64)
+    position = np.zeros(len(text), dtype=np.int64)
+    for column in range(11, -1, -1):
+        value = np.maximum(chars[:, column], 0)
+        two_digits = value >= 10
+        total += luhn(value % 10, position)
+        position += 1
+        total += np.where(two_digits, luhn(value // 10, position), 0)
+        position += two_digits
+    return {'well_formed': well_formed, 'check_digit': well_formed & (total % 10 == 0)}
+
+
+class Columns:
+    """The columns of a sheet for the checks, each normalized (stripped, upper-cased) once."""
+
+    def __init__(self, df: pd.DataFrame):
+        self.df = df
+        self._normalized: Dict[str, np.ndarray] = {}
+
+    def normalized(self, column: str) -> np.ndarray:
+        if column not in self._normalized:
+            self._normalized[column] = normalized(self.df[column])
+        return self._normalized[column]
+
+    def equals(self, column: str, value: str) -> np.ndarray:
+        return self.normalized(column) == value
+
+    def isin(self, column: str, values) -> np.ndarray:
+        # Per distinct value: the columns are low-cardinality
+        codes, uniques = pd.factorize(self.normalized(column))
+        allowed = np.append(np.isin(np.asarray(uniques, dtype=object), list(values)), False)
+        return allowed[codes]
+
+
+@dataclass
+class Check:
+    """A validation rule: ``test`` returns True for the rows that violate it."""
+    name: str
+    description: str
+    columns: Sequence[str]
+    test: Callable[[Columns], np.ndarray]
+
+
+def _isin_violations(columns: Columns, check: str) -> np.ndarray:
+    violated = np.zeros(len(columns.df), dtype=bool)
+    rows = np.flatnonzero(columns.equals(IDENTIFIER, 'ISIN'))
+    # Each distinct security is checked once, all of them together
+    codes, uniques = pd.factorize(columns.df[SECURITY].to_numpy(dtype=object)[rows], use_na_sentinel=False)
+    passed = isin_checks(uniques)
+    if check == 'check_digit':  # malformed ISINs are reported once, by the format check
+        passed = passed['check_digit'] | ~passed['well_formed']
+    else:
+        passed = passed['well_formed']
+    violated[rows] = ~passed[codes]
+    return violated
+
+
+def _residency_violations(columns: Columns) -> np.ndarray:
+    known = columns.isin(COUNTERPARTY_TYPE, COUNTERPARTY_TYPES) & columns.isin(COUNTRY, COUNTRY_CODES)
+    resident = columns.isin(COUNTERPARTY_TYPE, [kind for kind in COUNTERPARTY_TYPES if kind.startswith('R')])
+    return known & (resident != columns.equals(COUNTRY, DOMESTIC_COUNTRY))
+
+
+# Checks run by validate(), in report order
+VALIDATION_CHECKS: List[Check] = [
+    Check('isin_format', 'ИСИН не е во форматот: 2 букви, 9 букви или цифри и контролна цифра',
+          [IDENTIFIER, SECURITY], lambda columns: _isin_violations(columns, 'well_formed')),
+    Check('isin_check_digit', 'Погрешна контролна цифра на ИСИН (Luhn)',
+          [IDENTIFIER, SECURITY], lambda columns: _isin_violations(columns, 'check_digit')),
+    Check('otid_listing', 'OTID (тикер) за хартија што не котира (Котација не е KT)',
+          [IDENTIFIER, LISTING],
+          lambda columns: columns.equals(IDENTIFIER, 'OTID') & ~columns.equals(LISTING, 'KT')),
+    Check('counterparty_type', f"Тип на договорна страна не е {'/'.join(COUNTERPARTY_TYPES)}",
+          [COUNTERPARTY_TYPE], lambda columns: ~columns.isin(COUNTERPARTY_TYPE, COUNTERPARTY_TYPES)),
+    Check('country_code', 'Земја не е важечки ISO 3166 код',
+          [COUNTRY], lambda columns: ~columns.isin(COUNTRY, COUNTRY_CODES)),
+]
+
+# Checks validate() runs only when asked for, e.g. validate(df, VALIDATION_CHECKS + OPTIONAL_CHECKS)
+OPTIONAL_CHECKS: List[Check] = [
+    Check('residency_country', f'Резидент со Земја различна од {DOMESTIC_COUNTRY} или нерезидент со {DOMESTIC_COUNTRY}',
+          [COUNTERPARTY_TYPE, COUNTRY], _residency_violations),
+]
+
+
+@dataclass
+class Violation:
+    """The rows of a sheet that violate one check, as index labels."""
+    check: Check
+    rows: np.ndarray
+
+    @property
+    def count(self) -> int:
+        return len(self.rows)
+
+
+@dataclass
+class ValidationReport:
+    """Violations of every check that found any, and the checks skipped for missing columns."""
+    rows_checked: int
+    violations: List[Violation] = field(default_factory=list)
+    skipped: List[str] = field(default_factory=list)
+    seconds: float = 0.0
+
+    @property
+    def ok(self) -> bool:
+        return not self.violations
+
+    def summary(self) -> pd.DataFrame:
+        """One row per violated check, with its count and the first rows."""
+        return pd.DataFrame({
+            'Правило': [v.check.name for v in self.violations],
+            'Опис': [v.check.description for v in self.violations],
+            'Број на редови': [v.count for v in self.violations],
+            'Редови': [', '.join(map(str, v.rows[:EXAMPLE_ROWS])) + (' ...' if v.count > EXAMPLE_ROWS else '')
+                       for v in self.violations],
+        })
+
+    def rows(self, df: pd.DataFrame, check: str) -> pd.DataFrame:
+        """The rows of ``df`` (the validated sheet) that violate ``check``."""
+        for violation in self.violations:
+            if violation.check.name == check:
+                return df.loc[violation.rows]
+        return df.iloc[:0]
+
+    def rows_from_chunks(self, chunks: Iterable[pd.DataFrame], check: str) -> pd.DataFrame:
+        """The rows that violate ``check``, picked from the chunks of a sheet validated with validate_chunks."""
+        labels = next((v.rows for v in self.violations if v.check.name == check), np.empty(0))
+        parts = [chunk.loc[chunk.index.intersection(labels)] for chunk in chunks]
+        return pd.concat(parts) if parts else pd.DataFrame()
+
+
+def _run_checks(df: pd.DataFrame, checks: Sequence[Check], report: ValidationReport) -> None:
+    """Run the checks over ``df``, adding its violating rows to the report's."""
+    columns = Columns(df)
+    found = {violation.check.name: violation for violation in report.violations}
+    for check in checks:
+        if any(col not in df.columns for col in check.columns):
+            if check.name not in report.skipped:
+                report.skipped.append(check.name)
+            continue
+        with step(f'check {check.name}', rows_in=len(df)) as record:
+            violated = np.asarray(check.test(columns), dtype=bool)
+            record.rows_out = int(violated.sum())
+        if record.rows_out:
+            rows = df.index.to_numpy()[violated]
+            if check.name in found:
+                found[check.name].rows = np.concatenate([found[check.name].rows, rows])
+            else:
+                found[check.name] = Violation(check, rows)
+                report.violations.append(found[check.name])
+    # Report order is the order of the checks, whichever chunk found a violation first
+    order = {check.name: position for position, check in enumerate(checks)}
+    report.violations.sort(key=lambda violation: order[violation.check.name])
+
+
+def validate(df: pd.DataFrame, checks: Optional[Sequence[Check]] = None) -> ValidationReport:
+    """
+    Run the checks over the 'Примени податоци' rows.
+
+    Every check is a few array operations over whole columns, and string
+    columns are normalized once per distinct value, so the cost grows with
+    the row count only through NumPy passes.
+    """
+    checks = VALIDATION_CHECKS if checks is None else checks
+    report = ValidationReport(rows_checked=len(df))
+    started = time.perf_counter()
+    with trace('validate', rows=len(df)):
+        _run_checks(df, checks, report)
+    report.seconds = time.perf_counter() - started
+    return report
+
+
+def validate_chunks(chunks: Iterable[pd.DataFrame], checks: Optional[Sequence[Check]] = None) -> ValidationReport:
+    """
+    Run the checks over a sheet read in chunks (see streaming.iter_sheet_chunks).
+
+    Every check is row-wise, so checking chunk by chunk finds the same
+    violations as validate() on the whole sheet, with only one chunk in memory.
+    """
+    checks = VALIDATION_CHECKS if checks is None else checks
+    report = ValidationReport(rows_checked=0)
+    started = time.perf_counter()
+    with trace('validate', streaming=True):
+        for chunk in chunks:
+            report.rows_checked += len(chunk)
+            _run_checks(chunk, checks, report)
+    report.seconds = time.perf_counter() - started
+    return report
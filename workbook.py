@@ -0,0 +1,150 @@
+import hashlib
+import io
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Sequence
+
+import pandas as pd
+from instrumentation import count_rows, source_name, step
+from schema import apply_schema, arrow_compatible
+from sheet_cache import SheetCache, default_cache
+
+# Number of distinct uploads kept parsed in memory at the same time
+MAX_SESSIONS = 4
+
+
+def read_source_bytes(source) -> bytes:
+    """Read the raw bytes of an uploaded file, file-like object or path."""
+    if isinstance(source, (bytes, bytearray)):
+        return bytes(source)
+    if hasattr(source, 'getvalue'):
+        return source.getvalue()
+    if hasattr(source, 'read'):
+        source.seek(0)
+        data = source.read()
+        source.seek(0)
+        return data
+    with open(source, 'rb') as handle:
+        return handle.read()
+
+
+def content_hash(data: bytes) -> str:
+    """SHA-256 of the workbook content, used as the session key."""
+    return hashlib.sha256(data).hexdigest()
+
+
+class WorkbookSession:
+    """
+    One uploaded workbook, decompressed and parsed at most once per sheet.
+
+    Every consumer asking for the same sheet gets a shallow copy of the same
+    parsed frame, so renaming or adding columns does not leak between stages.
+    Parsed sheets are also written to the on-disk sheet cache, so reopening
+    the same file later skips openpyxl entirely.
+    """
+
+    def __init__(self, data: bytes, digest: Optional[str] = None,
+                 cache: Optional[SheetCache] = None, name: Optional[str] = None):
+        self.digest = digest or content_hash(data)
+        self.cache = cache
+        self.name = name  # file name of the upload, for instrumentation
+        self._data = data
+        self._sheet_names = None
+        self._excel = None
+        self._sheets: Dict[str, pd.DataFrame] = {}
+        self._lock = threading.Lock()
+        # One lock per sheet, so a sheet can be served or loaded while another is being parsed
+        self._sheet_locks: Dict[str, threading.Lock] = {}
+        # openpyxl reads the shared ExcelFile through one file handle, so parses take turns
+        self._excel_lock = threading.RLock()
+
+    @property
+    def excel(self) -> pd.ExcelFile:
+        """The underlying ExcelFile, opened on first use."""
+        with self._excel_lock:
+            if self._excel is None:
+                self._excel = pd.ExcelFile(io.BytesIO(self._data), engine='openpyxl')
+        return self._excel
+
+    def stream(self) -> io.BytesIO:
+        """A fresh binary stream over the raw workbook, for row-by-row readers."""
+        return io.BytesIO(self._data)
+
+    @property
+    def sheet_names(self) -> List[str]:
+        if self._sheet_names is None:
+            names = self.cache.sheet_names(self.digest) if self.cache else None
+            if names is None:
+                names = list(self.excel.sheet_names)
+                if self.cache:
+                    self.cache.store_sheet_names(self.digest, names)
+            self._sheet_names = names
+        return list(self._sheet_names)
+
+    def sheet(self, sheet_name: str, usecols: Optional[Sequence[str]] = None) -> pd.DataFrame:
+        """Return a sheet, parsing it only the first time it is requested."""
+        with self._lock:
+            sheet_lock = self._sheet_locks.setdefault(sheet_name, threading.Lock())
+        with sheet_lock:
+            frame = self._sheets.get(sheet_name)
+            if frame is None:
+                if self.cache:
+                    with step(f"sheet cache '{sheet_name}'") as record:
+                        frame = self.cache.load(self.digest, sheet_name)
+                        record.rows_out = count_rows(frame)
+                if frame is None:
+                    with step(f"read_excel '{sheet_name}'") as record, self._excel_lock:
+                        # Mixed-type columns as text, the way the cache stores them, so that
+                        # a cache hit returns the same frame as a fresh parse
+                        frame = arrow_compatible(self.excel.parse(sheet_name))
+                        record.rows_out = len(frame)
+                    if self.cache:
+                        try:
+                            self.cache.store(self.digest, sheet_name, frame)
+                        except OSError:
+                            pass  # a full or read-only cache must not break loading
+                # Typed once per session; the cache keeps the sheet as parsed
+                with step(f"schema '{sheet_name}'", rows_in=len(frame)):
+                    self._sheets[sheet_name] = frame = apply_schema(frame, sheet_name)
+
+        if usecols is None:
+            return frame.copy(deep=False)
+
+        missing = [col for col in usecols if col not in frame.columns]
+        if missing:
+            raise ValueError(f"Missing columns in sheet '{sheet_name}': {missing}")
+        # Keep the column order of the sheet, like read_excel(usecols=...) does
+        wanted = set(usecols)
+        return frame[[col for col in frame.columns if col in wanted]]
+
+    def sheets(self) -> Dict[str, pd.DataFrame]:
+        """Return all sheets as a dictionary, like read_excel(sheet_name=None)."""
+        return {name: self.sheet(name) for name in self.sheet_names}
+
+
+_sessions: 'OrderedDict[str, WorkbookSession]' = OrderedDict()
+_sessions_lock = threading.Lock()
+
+
+def open_workbook(source) -> WorkbookSession:
+    """
+    Return the shared session for an upload, keyed by a hash of its content.
+
+    Uploading (or passing a path to) the same file again reuses the frames
+    that were already parsed instead of reading the XML a second time.
+    """
+    if isinstance(source, WorkbookSession):
+        return source
+
+    data = read_source_bytes(source)
+    digest = content_hash(data)
+    with _sessions_lock:
+        session = _sessions.get(digest)
+        if session is None:
+            session = WorkbookSession(data, digest, cache=default_cache(), name=source_name(source))
+            _sessions[digest] = session
+            while len(_sessions) > MAX_SESSIONS:
+                _sessions.popitem(last=False)
+        else:
+            _sessions.move_to_end(digest)
+    return session